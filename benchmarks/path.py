@@ -0,0 +1,82 @@
+"""Benchmarks around path API.
+
+Run from repository root with ``python benchmarks/path.py``.
+
+"""
+from __future__ import print_function
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+
+import xal
+
+
+#: Shape of generated tree: number of subdirectories per level, per depth.
+BRANCHES = [10, 10, 10]
+
+#: Number of files in each directory.
+FILES = 10
+
+#: Patterns to glob.
+PATTERNS = ['**/*.txt', '*/*/*/file-1.txt', '**/missing-*.txt']
+
+
+def timed(function, *args, **kwargs):
+    """Return duration of ``function(*args, **kwargs)``, in seconds."""
+    start = time.time()
+    function(*args, **kwargs)
+    return time.time() - start
+
+
+def make_tree(root, branches):
+    """Create directories and files under ``root``, return number of files."""
+    count = 0
+    for index in range(FILES):
+        open(os.path.join(root, 'file-{index}.txt'.format(index=index)),
+             'w').close()
+        count += 1
+    if branches:
+        for index in range(branches[0]):
+            directory = os.path.join(root, 'dir-{index}'.format(index=index))
+            os.mkdir(directory)
+            count += make_tree(directory, branches[1:])
+    return count
+
+
+def pathlib_glob(session, root, pattern):
+    """Former implementation: list of paths, through :mod:`pathlib`."""
+    matches = pathlib.Path(root).glob(pattern)
+    return [session.path(str(match)) for match in matches]
+
+
+def xal_glob(session, root, pattern):
+    """Consume ``session.path.glob()``."""
+    return list(session.path.glob(root, pattern))
+
+
+def xal_glob_first(session, root, pattern):
+    """Get first match of ``session.path.glob()``, using ``limit``."""
+    return list(session.path.glob(root, pattern, limit=1))
+
+
+def main():
+    session = xal.LocalSession()
+    root = tempfile.mkdtemp()
+    try:
+        count = make_tree(root, BRANCHES)
+        print('Tree of {count} files.'.format(count=count))
+        for pattern in PATTERNS:
+            for function in [pathlib_glob, xal_glob, xal_glob_first]:
+                duration = timed(function, session, root, pattern)
+                print('{name} {pattern}: {duration:.3f}s'
+                      .format(name=function.__name__,
+                              pattern=pattern,
+                              duration=duration))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Benchmarks around remote files, through SFTP.
+
+Requires an SSH server on localhost, as tests do. Run from repository root
+with ``python benchmarks/sftp.py``. Set ``XAL_BENCHMARK_HOST`` environment
+variable to benchmark another host, where latency matters more.
+
+"""
+from __future__ import print_function
+import os
+import time
+
+import xal
+
+
+#: Size of files, in bytes.
+SIZE = 64 * 1024 * 1024
+
+#: Size of writes, in bytes: small writes, as of a log or a serializer.
+WRITE_SIZE = 4 * 1024
+
+#: Windows (read ahead and write behind), in bytes.
+WINDOWS = [0, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024]
+
+
+def timed(function, *args, **kwargs):
+    """Return duration of ``function(*args, **kwargs)``, in seconds."""
+    start = time.time()
+    function(*args, **kwargs)
+    return time.time() - start
+
+
+def write_file(file_obj, size):
+    """Write ``size`` bytes in small writes, then close ``file_obj``."""
+    data = b'x' * WRITE_SIZE
+    with file_obj:
+        for offset in range(0, size, WRITE_SIZE):
+            file_obj.write(data)
+
+
+def read_file(file_obj, size):
+    """Read ``file_obj`` in chunks, check size, close it."""
+    total = 0
+    with file_obj:
+        while True:
+            data = file_obj.read(1024 * 1024)
+            if not data:
+                break
+            total += len(data)
+    assert total == size
+
+
+def report(name, duration):
+    print('{name}: {duration:.3f}s ({rate:.1f} MiB/s)'.format(
+        name=name,
+        duration=duration,
+        rate=SIZE / 1024 / 1024 / duration))
+
+
+def main():
+    host = os.environ.get('XAL_BENCHMARK_HOST', 'localhost')
+    session = xal.FabricSession(host=host)
+    directory = session.sh.run('mktemp -d').stdout.strip()
+    path = session.path(directory) / session.path('benchmark.bin')
+    sftp_client = session.client.ssh_client
+    try:
+        # Former implementation: paramiko's files, one request at a time.
+        report('paramiko write',
+               timed(write_file, sftp_client.open(str(path), 'w'), SIZE))
+        report('paramiko read',
+               timed(read_file, sftp_client.open(str(path), 'r'), SIZE))
+        for window in WINDOWS:
+            session.path.sftp_read_ahead = window
+            session.path.sftp_write_behind = window
+            name = 'xal {window} KiB window'.format(window=window // 1024)
+            report(name + ' write',
+                   timed(write_file, path.open('wb'), SIZE))
+            report(name + ' read',
+                   timed(read_file, path.open('rb'), SIZE))
+    finally:
+        session.path.rm(session.path(directory))
+
+
+if __name__ == '__main__':
+    main()
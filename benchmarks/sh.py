@@ -0,0 +1,62 @@
+"""Benchmarks around sh API.
+
+Run from repository root with ``python benchmarks/sh.py``.
+
+"""
+from __future__ import print_function
+import time
+
+import xal
+
+
+#: Sizes of output, in bytes, pushed through commands.
+SIZES = [1024 * 1024, 64 * 1024 * 1024, 256 * 1024 * 1024]
+
+
+def timed(function, *args, **kwargs):
+    """Return duration of ``function(*args, **kwargs)``, in seconds."""
+    start = time.time()
+    function(*args, **kwargs)
+    return time.time() - start
+
+
+def run_large_output(session, size):
+    """Collect ``size`` bytes of output with ``session.sh.run()``."""
+    result = session.sh.run('head -c {size} /dev/zero'.format(size=size))
+    assert len(result.stdout) == size
+
+
+def stream_large_output(session, size):
+    """Consume ``size`` bytes of output with ``session.sh.stream()``."""
+    result = session.sh.stream('head -c {size} /dev/zero'.format(size=size))
+    total = 0
+    for chunk in result.iter_chunks():
+        total += len(chunk)
+    assert total == size
+
+
+def run_short_commands(session, count, shell):
+    """Run ``count`` short commands, with or without sh."""
+    for i in range(count):
+        session.sh.run(session.sh(['true'], shell=shell))
+
+
+def main():
+    session = xal.LocalSession()
+    count = 1000
+    for shell in [True, False]:
+        duration = timed(run_short_commands, session, count, shell)
+        print('run_short_commands shell={shell}: {rate:.0f} commands/s'
+              .format(shell=shell, rate=count / duration))
+    for size in SIZES:
+        for function in [run_large_output, stream_large_output]:
+            duration = timed(function, session, size)
+            print('{name} {size} MiB: {duration:.3f}s ({rate:.1f} MiB/s)'
+                  .format(name=function.__name__,
+                          size=size / 1024 / 1024,
+                          duration=duration,
+                          rate=size / 1024 / 1024 / duration))
+
+
+if __name__ == '__main__':
+    main()
@@ -56,6 +56,7 @@ if IS_PYTHON2:
     REQUIREMENTS.extend([
         'mock',
         'pathlib',
+        'scandir',
     ])
 ENTRY_POINTS = {}
 TEST_REQUIREMENTS = ['tox']
@@ -1,4 +1,6 @@
 """Tests around path API: paths, directories and files."""
+import errno
+import io
 import os
 import stat
 
@@ -32,6 +34,20 @@ def test_cd(session):
     session.path.cd(initial_path)
 
 
+def test_cwd_tracking(session):
+    """Remote working directory is tracked without round trips."""
+    if session.is_local:
+        return
+    initial_path = session.path.refresh_cwd()
+    assert initial_path == session.path.cwd()
+    with session.path.cd('tests/fixtures/..') as reached_path:
+        assert reached_path == initial_path / session.path('tests')
+        # Tracked value matches remote shell.
+        assert session.path.cwd() == reached_path
+        assert session.path.refresh_cwd() == reached_path
+    assert session.path.cwd() == initial_path
+
+
 def test_path_factory(session):
     """``path`` is a factory for :class:`~xal.path.resource.Path`."""
     from xal.path.resource import Path
@@ -66,6 +82,10 @@ def test_comparison(session):
     # Order of items in comparison doesn't affect the result.
     assert session.path('one') == Path('one')
 
+    # Equal paths have equal hashes: they can be keys of sets and dicts.
+    assert session.path('one') in set([session.path('one')])
+    assert hash(Path('one')) == hash(session.path('one'))
+
 
 def test_path_repr(session):
     """:class:`Path` is represented by 'Path(...)'."""
@@ -178,6 +198,28 @@ def test_stat(session):
     assert path.stat().st_size == 13
 
 
+def test_stat_many(session):
+    """``stat_many()`` and ``exists_many()`` handle several paths at once."""
+    from xal.path.resource import Path
+
+    paths = ['tests/fixtures/hello.txt', 'i-do-not-exist',
+             session.path('tests')]
+    results = session.path.stat_many(paths)
+    assert results[0].st_size == 13
+    assert isinstance(results[1], OSError)
+    assert stat.S_ISDIR(results[2].st_mode)
+    assert session.path.exists_many(paths) == [True, False, True]
+    assert session.path.stat_many([]) == []
+    # Errors tell why each path failed.
+    results = session.path.stat_many(['i-do-not-exist',
+                                      'tests/fixtures/hello.txt/child'])
+    assert [result.errno for result in results] == [errno.ENOENT,
+                                                    errno.ENOTDIR]
+    # Path class methods accept paths of sessions.
+    paths = [session.path(path) for path in paths]
+    assert Path.exists_many(paths) == [True, False, True]
+
+
 def test_chmod(session):
     """``Path`` instances implement chmod()."""
     path = session.path('tests/fixtures/hello.txt')
@@ -207,6 +249,44 @@ def test_glob(session):
     assert sorted(session.path('.').glob('tests/*/*.txt')) == [
         Path('tests/fixtures/hello.txt'),
     ]
+    assert sorted(session.path('tests').glob('**/sample-folder')) == [
+        Path('tests/fixtures/sample-folder'),
+    ]
+    assert len(list(session.path('.').glob('tests/**/*.txt', limit=2))) == 2
+
+
+def test_glob_symlinks(session):
+    """Local ``**`` follows symlinks to directories, skipping loops."""
+    from xal.path.resource import Path
+
+    if not session.is_local:  # find does not follow symlinks.
+        return
+    root = session.path('test_glob_symlinks')
+    try:
+        (root / session.path('real')).mkdir(parents=True)
+        (root / session.path('real/1.txt')).touch()
+        (root / session.path('link')).symlink_to(session.path('real'))
+        (root / session.path('real/loop')).symlink_to(session.path('..'))
+        assert sorted(root.glob('**/*.txt')) == [
+            Path('test_glob_symlinks/link/1.txt'),
+            Path('test_glob_symlinks/real/1.txt'),
+        ]
+    finally:
+        session.path.rm(root)
+
+
+def test_glob_special_names(session):
+    """``glob()`` and ``iterdir()`` handle any character in names."""
+    directory = session.path('test_glob').mkdir()
+    path = directory / session.path('new\nline.txt')
+    try:
+        path.open('w').write(u'')
+        assert [match.name for match in directory.glob('*.txt')] == [
+            'new\nline.txt']
+        assert list(directory.iterdir()) == [path]
+    finally:
+        path.unlink()
+        directory.rmdir()
 
 
 def test_group(session):
@@ -285,6 +365,262 @@ def test_iterdir(session):
     ]
 
 
+def test_scandir(session):
+    """``scandir()`` yields entries with type and stat result."""
+    from xal.path.resource import Path
+
+    entries = sorted(session.path('tests/fixtures').scandir(),
+                     key=lambda entry: entry.name)
+    assert [entry.name for entry in entries] == ['hello.txt', 'sample-folder']
+    assert [entry.path for entry in entries] == [
+        Path('tests/fixtures/hello.txt'),
+        Path('tests/fixtures/sample-folder'),
+    ]
+    assert entries[0].is_file() and not entries[0].is_dir()
+    assert entries[1].is_dir() and not entries[1].is_symlink()
+    entries = session.path.scandir('tests/fixtures', stat=True)
+    sizes = dict((entry.name, entry.stat().st_size) for entry in entries)
+    assert sizes['hello.txt'] == 13
+    try:
+        list(session.path.scandir('i-do-not-exist'))
+    except OSError:
+        pass
+    else:
+        raise AssertionError()
+
+
+def test_walk(session):
+    """``walk()`` yields directories with names of subdirs and files."""
+    from xal.path.resource import Path
+
+    walked = dict((directory, (sorted(subdirs), sorted(files)))
+                  for directory, subdirs, files
+                  in session.path('tests/fixtures').walk(workers=2))
+    assert walked == {
+        Path('tests/fixtures'): (['sample-folder'], ['hello.txt']),
+        Path('tests/fixtures/sample-folder'): (
+            [], ['sample-1.txt', 'sample-2.txt', 'sample-3.json']),
+    }
+    assert list(session.path.walk('i-do-not-exist')) == []
+
+
+def test_cache(session):
+    """Metadata cache is invalidated by xal's mutations."""
+    path = session.path('test_cache')
+    with session.path.caching() as cache:
+        assert path.exists() is False
+        assert path.exists() is False
+        assert cache.hits == 1
+        try:
+            path.touch(mode=0o644)
+            assert path.exists() is True
+            assert path.is_file() is True
+            path.chmod(0o600)
+            assert stat.S_IMODE(path.stat().st_mode) == 0o600
+        finally:
+            path.unlink()
+        assert path.exists() is False
+        # Ancestors created by mkdir(parents=True).
+        child = path / session.path('child')
+        try:
+            assert path.exists() is False
+            assert child.exists() is False
+            (child / session.path('grandchild')).mkdir(parents=True)
+            assert path.exists() is True
+            assert child.exists() is True
+        finally:
+            session.path.rm(path)
+    assert session.path.cache is None
+
+
+def test_copy_to(session):
+    """``copy_to()`` copies files and directories between sessions."""
+    import xal
+
+    local_session = xal.LocalSession()
+    source = session.path('tests/fixtures/hello.txt')
+    target = local_session.path('test_copy_to.txt')
+    try:
+        assert source.copy_to(target) is target
+        assert target.open().read() == source.open().read()
+        assert target.stat().st_mode == source.stat().st_mode
+        assert int(target.stat().st_mtime) == int(source.stat().st_mtime)
+    finally:
+        target.unlink()
+    source = session.path('tests/fixtures/sample-folder')
+    target = local_session.path('test_copy_to')
+    try:
+        source.copy_to(target)
+        assert sorted(child.name for child in target.iterdir()) == [
+            'sample-1.txt', 'sample-2.txt', 'sample-3.json']
+    finally:
+        local_session.path.rm(target)
+
+
+def test_sync(session):
+    """``sync()`` transfers changed files only."""
+    import xal
+
+    local_session = xal.LocalSession()
+    target = local_session.path('test_sync')
+    try:
+        report = session.path.sync('tests/fixtures', target)
+        assert sorted(report.copied) == [
+            'hello.txt', 'sample-folder/sample-1.txt',
+            'sample-folder/sample-2.txt', 'sample-folder/sample-3.json']
+        (target / local_session.path('extra.txt')).touch()
+        report = session.path.sync('tests/fixtures', target, delete=True,
+                                   dry_run=True)
+        assert not report.copied
+        assert report.deleted == ['extra.txt']
+        assert (target / local_session.path('extra.txt')).exists()
+        report = session.path.sync('tests/fixtures', target, delete=True,
+                                   checksum=True)
+        assert len(report.unchanged) == 4
+        assert not (target / local_session.path('extra.txt')).exists()
+        # Deltas are only used from local sources to remote targets.
+        with (target / local_session.path('hello.txt')).open('wb') as file_obj:
+            file_obj.write(b'changed')
+        report = session.path.sync('tests/fixtures', target,
+                                   delta_threshold=1)
+        assert report.copied == ['hello.txt']
+        assert not report.patched
+    finally:
+        local_session.path.rm(target)
+
+
+def test_open_pipelined(session):
+    """Files written and read in many small operations keep content."""
+    path = session.path('test_open_pipelined')
+    data = b''.join(
+        [str(index).encode('ascii') + b'\n' for index in range(50000)])
+    try:
+        with path.open('wb') as file_obj:
+            for offset in range(0, len(data), 1000):
+                file_obj.write(data[offset:offset + 1000])
+        with path.open('rb') as file_obj:
+            assert file_obj.read(10) == data[:10]
+            file_obj.seek(100000)
+            assert file_obj.read(100) == data[100000:100100]
+            assert file_obj.tell() == 100100
+            assert file_obj.read() == data[100100:]
+        with path.open() as file_obj:
+            assert len(file_obj.readlines()) == 50000
+    finally:
+        path.unlink()
+
+
+def test_open_read_after_write(session):
+    """Reads following writes or seeks start at current position."""
+    path = session.path('test_open_read_after_write')
+    try:
+        path.open('wb').write(b'0123456789')
+        with path.open('r+b') as file_obj:
+            file_obj.write(b'ab')
+            assert file_obj.read(3) == b'234'
+        with path.open('a+b') as file_obj:
+            file_obj.seek(0, os.SEEK_END)
+            assert file_obj.read() == b''
+            file_obj.write(b'XY')
+            file_obj.seek(0)
+            assert file_obj.read() == b'ab23456789XY'
+        with path.open('w+b') as file_obj:
+            file_obj.write(b'xyz')
+            file_obj.seek(3)
+            assert file_obj.read() == b''
+            file_obj.seek(1)
+            assert file_obj.read() == b'yz'
+    finally:
+        path.unlink()
+
+
+def test_read_bytes(session):
+    """``read_bytes()``, ``iter_chunks()`` and ``mmap()`` read content."""
+    path = session.path('tests/fixtures/hello.txt')
+    with path.open('rb') as file_obj:
+        expected = file_obj.read()
+    assert path.read_bytes() == expected
+    chunks = [chunk.tobytes() for chunk in path.iter_chunks(4)]
+    assert b''.join(chunks) == expected
+    assert all(len(chunk) == 4 for chunk in chunks[:-1])
+    if not session.is_local:
+        return
+    mapped = path.mmap()
+    try:
+        assert mapped[:4] == expected[:4]
+    finally:
+        mapped.close()
+
+
+def test_checksum(session):
+    """``checksum()`` hashes files in their session."""
+    import hashlib
+
+    path = session.path('tests/fixtures/hello.txt')
+    with path.open('rb') as file_obj:
+        expected = hashlib.sha256(file_obj.read()).hexdigest()
+    assert path.checksum() == expected
+    results = session.path.checksum_many(
+        [path, session.path('tests/fixtures/missing'),
+         session.path('tests/fixtures')])
+    assert results[0] == expected
+    assert isinstance(results[1], OSError)
+    assert isinstance(results[2], OSError)
+
+
+def test_delta(session):
+    """Block deltas rebuild changed files."""
+    from xal.path import delta
+
+    path = session.path('test_delta')
+    old = ''.join(chr(index % 251) for index in range(200000))
+    new = old[:1000] + 'inserted' + old[1000:150000]
+    try:
+        path.open('wb').write(old)
+        signatures = session.path.block_signatures(path, block_size=4096)
+        instructions = list(delta.delta(io.BytesIO(new), signatures, 4096))
+        assert sum(len(value) for kind, value in instructions
+                   if kind == 'data') < 3 * 4096
+        session.path.patch(path, instructions, block_size=4096)
+        assert path.open('rb').read() == new
+    finally:
+        path.unlink()
+
+
+def test_batch(session):
+    """Mutations within ``batch()`` blocks are run, errors tell the call."""
+    root = session.path('test_batch')
+    file_path = root / session.path('file')
+    link_path = root / session.path('link')
+    try:
+        with session.path.batch():
+            root.mkdir()
+            file_path.touch(mode=0o640)
+            link_path.symlink_to(file_path)
+        assert stat.S_IMODE(file_path.stat().st_mode) == 0o640
+        assert link_path.is_symlink()
+        try:
+            with session.path.batch():
+                link_path.unlink()
+                root.rmdir()  # Not empty.
+                root.touch()
+        except OSError as exception:
+            assert exception.errno == errno.ENOTEMPTY
+        else:
+            raise AssertionError()
+        assert not link_path.is_symlink()
+        assert file_path.exists()
+        # Metadata cached while operations wait are dropped once they ran.
+        other_path = root / session.path('other')
+        with session.path.caching():
+            with session.path.batch():
+                other_path.touch()
+                other_path.exists()
+            assert other_path.exists()
+    finally:
+        session.path.rm(root)
+
+
 def test_mkdir(session):
     """``Path`` instances implement mkdir()."""
     import stat
@@ -68,3 +68,318 @@ def test_pipes(session):
     assert piped().stdout == 'world\n'
     # run() shortcut works too.
     assert session.sh.run(echo | grep).stdout == 'world\n'
+
+
+def test_large_output(session):
+    """Output larger than pipe buffers is collected without deadlock."""
+    size = 1024 * 1024
+    result = session.sh.run(
+        'head -c {size} /dev/zero; head -c {size} /dev/zero >&2'
+        .format(size=size))
+    assert len(result.stdout) == size
+    assert len(result.stderr) == size
+    assert result.succeeded is True
+
+
+def test_stream(session):
+    """Output can be consumed while command runs."""
+    result = session.sh.stream("printf 'hello\nworld'; printf oops >&2")
+    assert list(result.iter_lines()) == ['hello\n', 'world']
+    assert result.stdout is None  # Streamed output is not kept.
+    assert result.stderr == 'oops'
+    assert result.succeeded is True
+    # Records may span many chunks.
+    result = session.sh.stream(
+        "head -c 300000 /dev/zero | tr '\\000' x; printf '\\000\\000y'")
+    assert list(result.iter_records()) == ['x' * 300000, '', 'y']
+    # ShCommand resources have a ``stream()`` shortcut.
+    command = session.sh('seq 3')
+    assert ''.join(command.stream().iter_chunks()) == '1\n2\n3\n'
+
+
+def test_concurrent_commands(session):
+    """Commands started with ``stream()`` run concurrently."""
+    results = [session.sh.stream('sleep 0.3; echo -n slow'),
+               session.sh.stream('echo -n fast')]
+    assert results[0].done is False
+    # ``as_completed()`` yields results as commands terminate.
+    completed = list(session.sh.as_completed(results))
+    assert [result.stdout for result in completed] == ['fast', 'slow']
+    # ``wait()`` returns results in input order.
+    results = [session.sh.stream('echo -n {i}'.format(i=i))
+               for i in range(20)]
+    results = session.sh.wait(results)
+    assert [result.stdout for result in results] == \
+        [str(i) for i in range(20)]
+    assert all(result.succeeded for result in results)
+
+
+def test_run_many(session):
+    """``sh.run_many()`` runs commands concurrently, on a bounded pool."""
+    commands = ['sleep 0.2; echo -n slow', 'exit 3'] + \
+        ['echo -n {i}'.format(i=i) for i in range(10)]
+    # Results are yielded in input order by default.
+    results = list(session.sh.run_many(commands, max_workers=3))
+    assert [result.stdout for result in results] == \
+        ['slow', ''] + [str(i) for i in range(10)]
+    # Failures do not abort the batch.
+    assert results[1].return_code == 3
+    # Results can be yielded as commands complete.
+    results = list(session.sh.run_many(commands, max_workers=3,
+                                       ordered=False))
+    assert len(results) == len(commands)
+    assert results[-1].stdout == 'slow'
+
+
+def test_pipe_return_codes(session):
+    """Results of pipes report return code of every stage, when known."""
+    piped = session.sh('echo hello') | session.sh('exit 3') \
+        | session.sh('cat')
+    result = piped()
+    assert result.return_code == 0
+    if session.is_local:
+        assert result.return_codes == [0, 3, 0]
+    else:  # Remote shell only reports return code of the last stage.
+        assert result.return_codes is None
+
+
+def test_exec_mode(session):
+    """With ``shell=False``, arguments are executed without sh."""
+    command = session.sh(['echo', '-n', 'a  b;c'], shell=False)
+    # Text representation is quoted, as sh would need.
+    assert str(command) == "echo -n 'a  b;c'"
+    assert command().stdout == 'a  b;c'
+    # Stages of pipes can be run without sh too.
+    piped = command | session.sh(['tr', 'a', 'A'], shell=False)
+    assert piped().stdout == 'A  b;c'
+
+
+def test_command_not_found():
+    """Local exec mode raises ``CommandNotFound`` for missing executables."""
+    import xal
+    from xal.sh.provider import CommandNotFound
+
+    session = xal.LocalSession()
+    try:
+        session.sh(['i-do-not-exist'], shell=False)()
+    except CommandNotFound:
+        pass
+    else:
+        raise AssertionError()
+
+
+def test_run_batch(session):
+    """``sh.run_batch()`` runs commands one after the other."""
+    results = session.sh.run_batch([
+        'echo -n one',
+        'echo two >&2; exit 3',
+        session.sh("printf 'line\\nno newline'"),
+    ])
+    assert [result.stdout for result in results] == \
+        ['one', '', 'line\nno newline']
+    assert [result.stderr for result in results] == ['', 'two\n', '']
+    assert [result.return_code for result in results] == [0, 3, 0]
+
+
+def test_run_batch_stop_on_error(session):
+    """``sh.run_batch(stop_on_error=True)`` stops at first failure."""
+    results = session.sh.run_batch(['true', 'exit 3', 'echo -n three'],
+                                   stop_on_error=True)
+    assert [result.return_code for result in results[:2]] == [0, 3]
+    assert results[2].error is not None
+
+
+def test_run_batch_options(session):
+    """Remote batches refuse commands with stdin, outputs or timeout."""
+    command = session.sh('cat', stdin='some text')
+    if session.is_local:  # Commands run one by one.
+        assert session.sh.run_batch([command])[0].stdout == 'some text'
+        return
+    try:
+        session.sh.run_batch(['true', command])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError()
+
+
+def test_batch_script():
+    """``ShBatch`` frames output of commands run in a single script."""
+    import xal
+    from xal.sh.batch import ShBatch
+
+    batch = ShBatch(['echo -n one', 'echo two >&2; exit 3', 'cd /', 'pwd'])
+    session = xal.LocalSession()
+    output = session.sh.run(str(batch))
+    results = batch.parse(output.stdout, output.stderr)
+    assert [result.stdout for result in results] == \
+        ['one', '', '', session.path.cwd().as_posix() + '\n']
+    assert [result.stderr for result in results] == ['', 'two\n', '', '']
+    assert [result.return_code for result in results] == [0, 3, 0, 0]
+    # Interrupted batches report missing output as errors.
+    results = batch.parse(output.stdout[:-20], output.stderr)
+    assert results[2].error is None
+    assert results[3].error is not None
+
+
+def test_persistent(session):
+    """With ``persistent``, ``sh.run()`` uses a long-lived shell."""
+    session.sh.persistent = True
+    try:
+        shell_pid = session.sh.run('echo $$').stdout
+        assert session.sh.run('echo $$').stdout == shell_pid
+        # Commands do not alter shell.
+        result = session.sh.run('echo -n oops >&2; exit 3')
+        assert result.stderr == 'oops'
+        assert result.return_code == 3
+        assert session.sh.run('echo $$').stdout == shell_pid
+        # Working directory follows session.
+        with session.path.cd('tests') as tests_dir:
+            assert session.sh.run('pwd').stdout.strip() == str(tests_dir)
+    finally:
+        session.sh.persistent = False
+        session.sh.coprocess.close()
+    assert session.sh.run('echo $$').stdout != shell_pid
+
+
+def test_output_policies(session):
+    """Output storage is configured per command."""
+    from xal.sh.output import DiscardOutput, SpooledOutput, TailOutput
+
+    command = session.sh('seq 10000',
+                         stdout=SpooledOutput(max_size=1024),
+                         stderr=DiscardOutput())
+    result = command()
+    assert result.outputs['stdout'].spilled is True
+    assert result.open().readline() == '1\n'
+    assert result.stdout.endswith('\n9999\n10000\n')
+    assert str(result.outputs['stdout'].buffer()[:4]) == '1\n2\n'
+    # Command is a template: results do not share outputs.
+    assert command().outputs['stdout'] is not result.outputs['stdout']
+
+    result = session.sh('seq 10000', stdout=TailOutput(max_size=11))()
+    assert result.stdout == '9999\n10000\n'
+    assert result.outputs['stdout'].size == len(
+        ''.join('{0}\n'.format(i) for i in range(1, 10001)))
+
+    result = session.sh('seq 10000; echo oops >&2',
+                        stdout=DiscardOutput())()
+    assert result.stdout == ''
+    assert result.stderr == 'oops\n'
+
+
+def test_stdin(session):
+    """Commands read stdin from text, files, paths or iterables."""
+    import io
+    import os
+
+    import xal
+
+    hello = session.path('tests/fixtures/hello.txt')
+    expected = hello.open().read()
+    # Text.
+    assert session.sh('cat', stdin='some text')().stdout == 'some text'
+    # Paths, including the ones of other sessions.
+    assert session.sh('cat', stdin=hello)().stdout == expected
+    local_session = xal.LocalSession()
+    local_hello = local_session.path(os.path.abspath(str(hello)))
+    assert session.sh('cat', stdin=local_hello)().stdout == expected
+    # File objects, with or without file descriptor.
+    with open(str(hello), 'rb') as hello_file:
+        assert session.sh('cat', stdin=hello_file)().stdout == expected
+    assert session.sh('cat', stdin=io.BytesIO('bytes'))().stdout == 'bytes'
+    # Iterables, consumed as command reads input.
+    chunks = ('{0}\n'.format(i) for i in range(100000))
+    result = session.sh('wc -l', stdin=chunks)()
+    assert result.stdout.strip() == '100000'
+    # Input is not required to be consumed.
+    chunks = ('{0}\n'.format(i) for i in range(100000))
+    assert session.sh('head -n 1', stdin=chunks)().stdout == '0\n'
+    # Pipes read stdin too.
+    piped = session.sh('cat', stdin='a\nb\n') | session.sh('grep b')
+    assert piped().stdout == 'b\n'
+
+
+def test_timeout(session):
+    """Commands exceeding their timeout are killed, with their children."""
+    import time
+
+    started = time.time()
+    command = session.sh('sleep 30 & echo $!; printf partial; wait',
+                         timeout=0.5)
+    result = command()
+    assert time.time() - started < 10
+    assert result.timed_out
+    assert not result.succeeded
+    # Partial output is kept.
+    pid, partial = result.stdout.split('\n')
+    assert partial == 'partial'
+    # Background child was killed too (it may remain a zombie for a while).
+    state = session.sh('ps -o stat= -p {0}'.format(pid))().stdout.strip()
+    assert state in ('', 'Z')
+    assert not session.sh('true', timeout=10)().timed_out
+    # Session default.
+    session.sh.timeout = 0.5
+    try:
+        assert session.sh('sleep 30')().timed_out
+    finally:
+        session.sh.timeout = None
+    # Deadline shared by a batch of commands.
+    commands = ['true', 'sleep 30', 'sleep 30']
+    results = list(session.sh.run_many(commands, max_workers=2, timeout=1))
+    assert [each.timed_out for each in results] == [False, True, True]
+    assert results[0].succeeded
+    # Children of commands killed at batch deadline are killed too.
+    commands = ["sh -c 'sleep 30' & echo $!; wait", 'true']
+    results = list(session.sh.run_many(commands, timeout=0.5))
+    assert results[0].timed_out
+    pid = results[0].stdout.strip()
+    state = session.sh('ps -o stat= -p {0}'.format(pid))().stdout.strip()
+    assert state in ('', 'Z')
+    assert time.time() - started < 20
+
+
+def test_cache(session):
+    """Results of cacheable commands are reused, per working directory."""
+    from xal.sh.cache import ShResultCache
+
+    session.sh.cache = ShResultCache(ttl=60, max_size=2)
+    try:
+        pid = session.sh('echo $$', cacheable=True)().stdout
+        assert session.sh('echo $$', cacheable=True)().stdout == pid
+        assert (session.sh.cache.hits, session.sh.cache.misses) == (1, 1)
+        # Other commands are not cached.
+        assert session.sh('echo $$')().stdout != pid
+        # Neither are failures.
+        session.sh('echo $$; exit 1', cacheable=True)()
+        assert session.sh('echo $$; exit 1', cacheable=True)().stdout != pid
+        # Working directory is part of the key.
+        with session.path.cd('tests'):
+            assert session.sh('echo $$', cacheable=True)().stdout != pid
+        # Least recently used results are evicted.
+        session.sh('echo $$ other', cacheable=True)()
+        assert len(session.sh.cache) == 2
+        # Results expire.
+        session.sh.cache.ttl = 0
+        session.sh.cache.clear()
+        pid = session.sh('echo $$', cacheable=True)().stdout
+        assert session.sh('echo $$', cacheable=True)().stdout != pid
+    finally:
+        session.sh.cache = None
+
+
+def test_binary_output(session):
+    """Output is kept as bytes, whatever the return code."""
+    result = session.sh("printf '\\000\\377out'; printf err >&2; exit 2")()
+    assert result.stdout == '\x00\xffout'
+    assert result.stderr == 'err'
+    assert result.return_code == 2
+    # Decoding is explicit.
+    assert session.sh("printf 'caf\\303\\251'")().decode() == u'caf\xe9'
+    assert session.sh("printf '\\377'")().decode('latin-1') == u'\xff'
+    assert result.decode('ascii', 'replace', name='stderr') == u'err'
+    # Batches slice output without copying it.
+    results = session.sh.run_batch(["printf '\\000\\001'", 'exit 1'])
+    assert results[0].stdout == '\x00\x01'
+    assert results[0].outputs['stdout'].buffer().tobytes() == '\x00\x01'
+    assert results[1].return_code == 1
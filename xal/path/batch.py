@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Batches of path mutations, flushed in a single round trip.
+
+Within ``with session.path.batch():`` blocks, remote sessions record
+mutations (``mkdir()``, ``chmod()``, ``touch()``, ``symlink_to()``,
+``unlink()``, ``rmdir()``) as shell commands instead of running them. They
+are run as one script, with ``sh.run_batch()``, when the block exits or when
+:meth:`PathBatch.flush` is called.
+
+"""
+import errno
+import os
+import sys
+
+
+#: Directory of `xal` package: frames of its code are skipped when looking
+#: for the code which called an operation.
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#: Error codes recognized in messages of failed commands.
+ERROR_CODES = [
+    errno.ENOENT,
+    errno.EEXIST,
+    errno.EACCES,
+    errno.EPERM,
+    errno.ENOTDIR,
+    errno.EISDIR,
+    errno.ENOTEMPTY,
+    errno.EROFS,
+    errno.ENOSPC,
+]
+
+
+def error_code(message):
+    """Return error code whose description appears in ``message``, or
+    ``errno.EIO``."""
+    for code in ERROR_CODES:
+        if os.strerror(code) in message:
+            return code
+    return errno.EIO
+
+
+def caller():
+    """Return ``(filename, line, function)`` of the first frame which is not
+    in `xal` package, or ``None``."""
+    frame = sys._getframe(1)
+    while frame is not None \
+            and frame.f_code.co_filename.startswith(PACKAGE_DIR + os.sep):
+        frame = frame.f_back
+    if frame is None:
+        return None
+    return (frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name)
+
+
+class PathOperation(object):
+    """Mutation recorded in a :class:`PathBatch`."""
+    def __init__(self, name, path, command, caller=None):
+        #: Name of the path method, such as ``'mkdir'``.
+        self.name = name
+        #: Path the operation applies to.
+        self.path = path
+        #: Shell command performing the operation.
+        self.command = command
+        #: ``(filename, line, function)`` of the code which called the
+        #: operation, if known.
+        self.caller = caller
+        #: :class:`~xal.sh.resource.ShResult` of command, once flushed.
+        self.result = None
+        #: :class:`OSError`, if command failed.
+        self.error = None
+
+    def __repr__(self):
+        return '<{cls}: {name}({path!r})>'.format(
+            cls=self.__class__.__name__,
+            name=self.name,
+            path=str(self.path))
+
+    def location(self):
+        """Return ``file:line`` of the code which called the operation."""
+        if self.caller is None:
+            return 'unknown location'
+        return '{0}:{1}'.format(*self.caller)
+
+
+class PathBatchError(OSError):
+    """An operation of a batch failed.
+
+    Attributes of :class:`OSError` are the ones of the failed operation.
+
+    """
+    def __init__(self, operation, skipped):
+        error = operation.error
+        super(PathBatchError, self).__init__(
+            error.errno,
+            '{name}() called at {location} failed: {message}{skipped}'
+            .format(name=operation.name,
+                    location=operation.location(),
+                    message=error.strerror,
+                    skipped=' ({count} next operations were not run)'
+                    .format(count=len(skipped)) if skipped else ''),
+            error.filename)
+        #: :class:`PathOperation` which failed.
+        self.operation = operation
+        #: Operations recorded after it, which were not run.
+        self.skipped = skipped
+
+
+class PathBatch(object):
+    """Mutations of ``provider``'s paths, waiting to be run."""
+    def __init__(self, provider):
+        #: Path provider which recorded operations.
+        self.provider = provider
+        #: Operations not flushed yet.
+        self.operations = []
+
+    def __len__(self):
+        return len(self.operations)
+
+    def record(self, name, path, command):
+        """Record ``command`` performing operation ``name`` on ``path``,
+        return :class:`PathOperation`."""
+        operation = PathOperation(name, path, command, caller=caller())
+        self.operations.append(operation)
+        return operation
+
+    def discard(self):
+        """Forget operations not flushed yet."""
+        self.operations = []
+
+    def flush(self):
+        """Run recorded operations as a single script, return them.
+
+        Script stops at the first operation which fails: raise
+        :class:`PathBatchError` about it. Next operations are dropped.
+
+        Metadata of paths (and of their ancestors, which ``mkdir()`` may
+        create) are dropped from provider's ``cache``, if any, once script
+        ran: they may have been cached again since operations were recorded.
+
+        """
+        operations, self.operations = self.operations, []
+        if not operations:
+            return operations
+        try:
+            results = self.provider.xal_session.sh.run_batch(
+                [operation.command for operation in operations],
+                stop_on_error=True)
+        finally:
+            if self.provider.cache is not None:
+                for operation in operations:
+                    self.provider.cache.invalidate(
+                        self.provider.cache_key(operation.path),
+                        ancestors=operation.name == 'mkdir')
+        for index, (operation, result) in enumerate(zip(operations,
+                                                        results)):
+            operation.result = result
+            if result.error is not None or not result.succeeded:
+                message = result.decode(name='stderr').strip() \
+                    if result.error is None else str(result.error)
+                code = error_code(message)
+                operation.error = OSError(code, message or os.strerror(code),
+                                          str(operation.path))
+                raise PathBatchError(operation, operations[index + 1:])
+        return operations
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Cache of paths metadata.
+
+Assign an instance to ``session.path.cache``, or use
+``session.path.caching()`` context manager. Results of ``exists()``,
+``is_dir()``, ``is_file()``, ``stat()``, ``owner()`` and ``group()`` are then
+reused, until they expire or until `xal` alters the path.
+
+"""
+import collections
+import functools
+import inspect
+import time
+
+
+#: Returned by :meth:`PathMetadataCache.get` when nothing is stored.
+MISSING = object()
+
+
+class PathMetadataCache(object):
+    """Keep metadata of paths for ``ttl`` seconds, for at most ``max_size``
+    paths.
+
+    Least recently used paths are evicted first. ``ttl=None`` means metadata
+    never expire.
+
+    Keys are absolute paths, as text. Changes made outside of `xal`, or
+    through symlinks, are not noticed until entries expire.
+
+    """
+    def __init__(self, ttl=60, max_size=1024):
+        #: Delay, in seconds, after which metadata expire.
+        self.ttl = ttl
+        #: Maximum number of paths kept.
+        self.max_size = max_size
+        #: Number of lookups which returned a value.
+        self.hits = 0
+        #: Number of lookups which did not.
+        self.misses = 0
+        #: Mapping of paths to ``(expiry, {name: value})``, least recently
+        #: used first.
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, name):
+        """Return ``name`` metadata stored for path ``key``, or
+        :data:`MISSING`."""
+        entry = self._entries.pop(key, None)
+        if entry is None or (entry[0] is not None
+                             and entry[0] <= time.time()):
+            self.misses += 1
+            return MISSING
+        self._entries[key] = entry  # Most recently used.
+        value = entry[1].get(name, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, name, value):
+        """Store ``name`` metadata of path ``key``."""
+        entry = self._entries.pop(key, None)
+        if entry is None or (entry[0] is not None
+                             and entry[0] <= time.time()):
+            expiry = None if self.ttl is None else time.time() + self.ttl
+            entry = (expiry, {})
+        entry[1][name] = value
+        self._entries[key] = entry
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key, ancestors=False):
+        """Forget metadata of path ``key``, of its parent (whose stat result
+        changes when children are created or removed) and of its
+        descendants.
+
+        If ``ancestors`` is true, metadata of all ancestors are forgotten,
+        as ``mkdir(parents=True)`` may create some of them.
+
+        """
+        prefix = key.rstrip('/') + '/'
+        self._entries.pop(key, None)
+        parent = key
+        while parent != '/':
+            parent = parent.rstrip('/').rsplit('/', 1)[0] or '/'
+            self._entries.pop(parent, None)
+            if not ancestors:
+                break
+        for other in [other for other in self._entries
+                      if other.startswith(prefix)]:
+            del self._entries[other]
+
+    def clear(self):
+        """Forget all metadata. Counters are kept."""
+        self._entries.clear()
+
+
+def cached(method):
+    """Decorate provider's ``method(path)`` so that its result goes through
+    provider's ``cache``, if any.
+
+    Exceptions are not cached.
+
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, path, *args, **kwargs):
+        if self.cache is None or args or kwargs:
+            return method(self, path, *args, **kwargs)
+        key = self.cache_key(path)
+        value = self.cache.get(key, name)
+        if value is MISSING:
+            value = method(self, path)
+            self.cache.set(key, name, value)
+        return value
+    return wrapper
+
+
+def invalidates(*arguments):
+    """Return decorator for provider's methods which alter paths given as
+    ``arguments`` (names of method's arguments).
+
+    Metadata of those paths are dropped from provider's ``cache``, if any,
+    once method returned or raised.
+
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                if self.cache is not None:
+                    values = inspect.getcallargs(method, self, *args,
+                                                 **kwargs)
+                    for argument in arguments:
+                        self.cache.invalidate(
+                            self.cache_key(values[argument]))
+        return wrapper
+    return decorator
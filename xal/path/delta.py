@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""Rolling-checksum block deltas, as rsync does.
+
+Side holding the old file computes :func:`signatures` of its blocks. Side
+holding the new file computes :func:`delta` against them: instructions to
+copy blocks of the old file, or to insert data. Side holding the old file
+applies them with :func:`patch`. Only signatures and data not found in the
+old file have to be transferred.
+
+This module is standalone (standard library only, Python 2 and 3): remote
+sessions run it as a script, with ``python -c``, see :func:`main`.
+
+"""
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import zlib
+
+
+#: Default size of blocks, in bytes.
+BLOCK_SIZE = 64 * 1024
+
+#: Modulo of Adler-32 sums.
+ADLER_BASE = 65521
+
+#: Maximum size of data instructions, in bytes.
+MAX_DATA_SIZE = 1024 * 1024
+
+#: Size of chunks read from files, in bytes.
+CHUNK_SIZE = 1024 * 1024
+
+
+def weak_checksum(data):
+    """Return Adler-32 checksum of ``data``, which can be rolled."""
+    return zlib.adler32(bytes(data)) & 0xffffffff
+
+
+def strong_checksum(data):
+    """Return MD5 digest of ``data``, as hexadecimal text."""
+    return hashlib.md5(bytes(data)).hexdigest()
+
+
+def signatures(file_obj, block_size=BLOCK_SIZE):
+    """Return list of ``(weak, strong)`` checksums of blocks of ``file_obj``.
+
+    Last block may be shorter.
+
+    """
+    result = []
+    while True:
+        data = file_obj.read(block_size)
+        if not data:
+            return result
+        result.append((weak_checksum(data), strong_checksum(data)))
+
+
+def delta(file_obj, block_signatures, block_size=BLOCK_SIZE):
+    """Yield instructions rebuilding ``file_obj`` from blocks of old file.
+
+    Instructions are ``('copy', index)``, to copy block at ``index`` of old
+    file, or ``('data', data)``, to insert ``data``.
+
+    A window of ``block_size`` bytes rolls over ``file_obj``: its weak
+    checksum is updated in constant time per byte, and compared with the
+    ones of old blocks. Strong checksums confirm matches.
+
+    """
+    table = {}  # Weak checksum => {strong checksum: index}.
+    for index, (weak, strong) in enumerate(block_signatures):
+        table.setdefault(weak, {}).setdefault(strong, index)
+    last_block = None  # Last block, if shorter: matched at end only.
+    if block_signatures:
+        last_block = len(block_signatures) - 1
+    buffer = bytearray()
+    state = {'eof': False}
+
+    def fill(size):
+        """Read until ``buffer`` holds ``size`` bytes, or end of file."""
+        while len(buffer) < size and not state['eof']:
+            data = file_obj.read(max(CHUNK_SIZE, block_size))
+            if not data:
+                state['eof'] = True
+            buffer.extend(data)
+
+    position = 0  # Start of window in buffer. Before it: pending data.
+    weak = None
+    fill(block_size + 1)
+    while True:
+        if position >= MAX_DATA_SIZE:
+            yield ('data', bytes(buffer[:position]))
+            del buffer[:position]
+            position = 0
+        fill(position + block_size + 1)
+        if len(buffer) - position < block_size:
+            break  # Less than a block left.
+        if weak is None:
+            weak = weak_checksum(buffer[position:position + block_size])
+        candidates = table.get(weak)
+        if candidates:
+            window = buffer[position:position + block_size]
+            index = candidates.get(strong_checksum(window))
+            if index is not None:
+                if position:
+                    yield ('data', bytes(buffer[:position]))
+                yield ('copy', index)
+                del buffer[:position + block_size]
+                position = 0
+                weak = None
+                continue
+        if len(buffer) - position == block_size:
+            break  # Window reached end of file.
+        # Roll window one byte forward.
+        removed = buffer[position]
+        added = buffer[position + block_size]
+        a = weak & 0xffff
+        b = weak >> 16
+        a = (a - removed + added) % ADLER_BASE
+        b = (b - block_size * removed + a - 1) % ADLER_BASE
+        weak = (b << 16) | a
+        position += 1
+    # Remaining data: maybe old file's last block, which may be shorter.
+    if position < len(buffer) and last_block is not None:
+        tail = buffer[position:]
+        weak, strong = block_signatures[last_block]
+        if weak_checksum(tail) == weak and strong_checksum(tail) == strong:
+            if position:
+                yield ('data', bytes(buffer[:position]))
+            yield ('copy', last_block)
+            return
+    if buffer:
+        yield ('data', bytes(buffer))
+
+
+def patch(old_file, instructions, new_file, block_size=BLOCK_SIZE):
+    """Write to ``new_file`` the file described by ``instructions``."""
+    for kind, value in instructions:
+        if kind == 'copy':
+            old_file.seek(value * block_size)
+            new_file.write(old_file.read(block_size))
+        else:
+            new_file.write(value)
+
+
+def encode(instructions):
+    """Yield binary chunks encoding ``instructions``, for :func:`decode`."""
+    for kind, value in instructions:
+        if kind == 'copy':
+            yield b'C' + struct.pack('>Q', value)
+        else:
+            yield b'D' + struct.pack('>I', len(value))
+            yield value
+    yield b'E'
+
+
+def decode(file_obj):
+    """Yield instructions read from binary ``file_obj``, see :func:`encode`.
+    """
+    while True:
+        kind = file_obj.read(1)
+        if kind == b'C':
+            yield ('copy', struct.unpack('>Q', file_obj.read(8))[0])
+        elif kind == b'D':
+            size = struct.unpack('>I', file_obj.read(4))[0]
+            yield ('data', file_obj.read(size))
+        elif kind == b'E':
+            return
+        else:
+            raise ValueError('Truncated or invalid instructions.')
+
+
+def patch_path(path, instructions, block_size=BLOCK_SIZE):
+    """Rebuild file at ``path`` from ``instructions``, atomically.
+
+    New content is written to a temporary file in the same directory, which
+    then replaces ``path``.
+
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary_path = tempfile.mkstemp(dir=directory, prefix='.xal-')
+    try:
+        with open(path, 'rb') as old_file:
+            with os.fdopen(fd, 'wb') as new_file:
+                patch(old_file, instructions, new_file, block_size)
+        os.rename(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def main(arguments):
+    """Run as a script: ``signatures PATH BLOCK_SIZE`` writes a line
+    ``WEAK STRONG`` per block. ``patch PATH BLOCK_SIZE`` reads instructions
+    on stdin and rebuilds file."""
+    command, path, block_size = arguments[0], arguments[1], int(arguments[2])
+    stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+    if command == 'signatures':
+        with open(path, 'rb') as file_obj:
+            for weak, strong in signatures(file_obj, block_size):
+                sys.stdout.write('{0} {1}\n'.format(weak, strong))
+    elif command == 'patch':
+        patch_path(path, decode(stdin), block_size)
+    else:
+        raise ValueError('Unknown command {0!r}'.format(command))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
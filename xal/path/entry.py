@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Directory entries, as yielded by ``session.path.scandir()``.
+
+Like :class:`os.DirEntry`, entries carry name, type and optionally stat
+result, gathered by the listing itself: type checks do not hit the system.
+
+"""
+import stat
+
+
+class PathEntry(object):
+    """Entry of a directory listing."""
+    def __init__(self, path, name, type, target_type=None, lstat=None):
+        #: :class:`~xal.path.resource.Path` of the entry.
+        self.path = path
+        #: Name of the entry, relative to listed directory.
+        self.name = name
+        #: File type bits (as in ``stat.S_IFMT(mode)``) of the entry itself.
+        self.type = type
+        #: File type bits of symlink's target, ``None`` if link is broken.
+        #: Same as :attr:`type` for other entries.
+        self.target_type = target_type if type == stat.S_IFLNK else type
+        #: Stat result of the entry itself (not following symlinks), if
+        #: gathered by the listing.
+        self._lstat = lstat
+        #: Stat result of symlink's target, once known.
+        self._stat = None
+
+    def __repr__(self):
+        return '<{cls}: {name!r}>'.format(cls=self.__class__.__name__,
+                                          name=self.name)
+
+    def _type(self, follow_symlinks):
+        return self.target_type if follow_symlinks else self.type
+
+    def is_dir(self, follow_symlinks=True):
+        return self._type(follow_symlinks) == stat.S_IFDIR
+
+    def is_file(self, follow_symlinks=True):
+        return self._type(follow_symlinks) == stat.S_IFREG
+
+    def is_symlink(self):
+        return self.type == stat.S_IFLNK
+
+    def stat(self, follow_symlinks=True):
+        """Return stat result of entry.
+
+        Uses result gathered by the listing, if any. Following symlinks
+        costs a call to the system, once.
+
+        """
+        if follow_symlinks and self.is_symlink():
+            if self._stat is None:
+                self._stat = self.path.stat()
+            return self._stat
+        if self._lstat is None:
+            if self.is_symlink():
+                self._lstat = self.path.lstat()
+            else:
+                self._lstat = self.path.stat()
+        return self._lstat
+
+    def inode(self):
+        return self.stat(follow_symlinks=False).st_ino
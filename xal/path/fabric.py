@@ -1,7 +1,13 @@
 """Implementation of SSH filesystem path using Fabric."""
 from __future__ import absolute_import
+import errno
+import inspect
+import io
+import os
 import pathlib
+import pipes
 import posix
+import posixpath
 import stat
 
 import fabric.api
@@ -9,26 +15,78 @@ import fabric.context_managers
 import fabric.contrib.files
 import fabtools
 
+from xal.path import delta, sftp
+from xal.path.cache import cached, invalidates
+from xal.path.entry import PathEntry
+from xal.path.globbing import compile_pattern, match_names, rglob_pattern
 from xal.path.provider import PathProvider
 
 
+#: Mapping of file types, as printed by ``find -printf %y``, to file type
+#: bits. Other types (broken or looping links...) are unknown: ``None``.
+FIND_TYPES = {
+    'b': stat.S_IFBLK,
+    'c': stat.S_IFCHR,
+    'd': stat.S_IFDIR,
+    'f': stat.S_IFREG,
+    'l': stat.S_IFLNK,
+    'p': stat.S_IFIFO,
+    's': stat.S_IFSOCK,
+}
+
+#: Mapping of error messages, as remote commands write them with ``C``
+#: locale, to error codes.
+STRERROR_CODES = dict((os.strerror(code), code) for code in errno.errorcode)
+
+
 class FabricPathProvider(PathProvider):
     """SSH path manager."""
+    def __init__(self, *args, **kwargs):
+        super(FabricPathProvider, self).__init__(*args, **kwargs)
+
+        #: Remote working directory, as text, tracked locally so that
+        #: :meth:`cwd` and :meth:`resolve` do not run ``pwd`` remotely.
+        #: ``None`` until known.
+        self._cwd = None
+
+        #: Value of Fabric's ``env.cwd`` when :attr:`_cwd` was recorded.
+        #: If something else changes ``env.cwd`` (``fabric.api.cd()``...),
+        #: :attr:`_cwd` is outdated.
+        self._cwd_env = None
+
     def cwd(self):
-        """Return resource representing current working directory."""
+        """Return resource representing current working directory.
+
+        Working directory is tracked locally: only the first call (or a
+        call after ``env.cwd`` was changed outside of :meth:`cd`) runs
+        ``pwd`` remotely.
+
+        """
+        if self._cwd is None or self._cwd_env != fabric.api.env.cwd:
+            return self.refresh_cwd()
+        return self(self._cwd)
+
+    def refresh_cwd(self):
+        """Read working directory from remote shell, return it."""
         local_path = self.xal_session.sh.run('pwd').stdout.strip()
-        return self(str(local_path))
+        self._cwd = str(local_path)
+        self._cwd_env = fabric.api.env.cwd
+        return self(self._cwd)
 
     def cd(self, path):
         """Change current working directory and return new path object."""
-        local_path = self.resolve(path)
+        # Shell's ``cd`` resolves ``..`` logically, as normpath does.
+        local_path = posixpath.normpath(str(self.resolve(path)))
         # Remember initial path, for use at ``__exit__()``.
-        new_path = self(str(local_path))
+        new_path = self(local_path)
         new_path._exit_cwd = self.cwd()
         # Actually change working directory.
-        fabric.api.env.cwd = str(new_path)
+        fabric.api.env.cwd = local_path
+        self._cwd = local_path
+        self._cwd_env = fabric.api.env.cwd
         return new_path
 
+    @cached
     def exists(self, path):
         return fabric.contrib.files.exists(path)
 
@@ -36,11 +94,13 @@ class FabricPathProvider(PathProvider):
         local_path = pathlib.Path(str(path))
         return local_path.is_absolute()
 
+    @cached
     def is_dir(self, path):
         local_path = self.resolve(path)
         with fabric.context_managers.hide('running', 'stdout', 'stderr'):
             return fabtools.files.is_dir(local_path)
 
+    @cached
     def is_file(self, path):
         local_path = self.resolve(path)
         with fabric.context_managers.hide('running', 'stdout', 'stderr'):
@@ -49,6 +109,7 @@ class FabricPathProvider(PathProvider):
     def is_relative(self):
         return not self.is_absolute()
 
+    @invalidates('path')
     def mkdir(self, path, mode=0o777, parents=False):
         local_path = self.resolve(path)
         local_mode = '{mode:o}'.format(mode=mode)
@@ -56,8 +117,12 @@ class FabricPathProvider(PathProvider):
         if parents:
             command.append('--parents')
         command.append('--mode={mode}'.format(mode=local_mode))
-        command.append(local_path)
-        self.xal_session.sh.run(command)
+        command.append(pipes.quote(str(local_path)))
+        try:
+            self.run_mutation('mkdir', path, ' '.join(command))
+        finally:
+            if parents and self.cache is not None:
+                self.cache.invalidate(self.cache_key(path), ancestors=True)
         return self(str(local_path))
 
     def name(self, path):
@@ -74,11 +139,13 @@ class FabricPathProvider(PathProvider):
         return self(super(local_path.relative_to(str(other))))
 
     def resolve(self, path):
+        """Return absolute path, joined to tracked working directory."""
         local_path = pathlib.Path(str(path))
         if not pathlib.Path(local_path).is_absolute():
             local_path = pathlib.Path(str(self.cwd())) / local_path
         return self(str(local_path))
 
+    @invalidates('path')
     def rm(self, path):
         local_path = self.resolve(path)
         self.xal_session.sh.run(
@@ -88,38 +155,241 @@ class FabricPathProvider(PathProvider):
         """Return False if session has no sh interface."""
         return session.sh.supports(session)
 
+    #: Format of records :meth:`stat_many` reads: path, then fields of
+    #: :class:`posix.stat_result`, mode being hexadecimal.
+    stat_format = '%n\\0%f %i %d %h %u %g %s %X %Y %Z\\0'
+
+    @cached
     def stat(self, path):
         """Return stat result."""
-        local_path = self.resolve(path)
-        cmd = 'stat --printf="%f %i %d %h %u %g %s %X %Y %W" {path}' \
-              .format(path=local_path)
-        result = self.xal_session.sh.run(cmd)
-        if not result.succeeded:
-            if not self.exists(path):
-                raise OSError(path)
-            raise Exception()
-        result = result.stdout.split(" ")
-        result[0] = int(result[0], base=16)
-        result = map(int, result)
-        return posix.stat_result(result)
+        result = self.stat_many([path])[0]
+        if isinstance(result, OSError):
+            raise result
+        return result
+
+    def stat_many(self, paths):
+        """Return list of stat results (or :class:`OSError`) of ``paths``.
+
+        All paths are stat'ed in one remote command: paths are sent on stdin,
+        NUL-separated, so that neither their number nor their characters
+        matter, and ``stat`` writes NUL-separated records. Paths missing in
+        output get an :class:`OSError`, whose code is read from ``stat``'s
+        message, see :meth:`stat_errors`.
+
+        """
+        local_paths = [str(self.resolve(path)) for path in paths]
+        command = self.xal_session.sh(
+            "xargs -0 -r stat -L --printf='{format}' --".format(
+                format=self.stat_format),
+            stdin=''.join([path + '\0' for path in local_paths]))
+        output = self.xal_session.sh.run(command).stdout.split('\0')
+        found = {}
+        for index in range(0, len(output) - 1, 2):
+            fields = output[index + 1].split(' ')
+            fields[0] = int(fields[0], base=16)
+            found[output[index]] = posix.stat_result(map(int, fields))
+        results = [found.get(local_path) for local_path in local_paths]
+        missing = [index for index, result in enumerate(results)
+                   if result is None]
+        if missing:
+            codes = self.stat_errors([local_paths[index]
+                                      for index in missing])
+            for index, code in zip(missing, codes):
+                results[index] = OSError(code, os.strerror(code),
+                                         str(paths[index]))
+        return results
+
+    def stat_errors(self, local_paths):
+        """Return list of error codes of ``stat`` on ``local_paths``
+        (absolute, as text), run again in one remote command.
+
+        Codes are read from ``stat``'s messages, in ``C`` locale. Paths which
+        can be stat'ed by now get ``ENOENT``: they were missing.
+
+        """
+        script = 'for f; do stat -L -- "$f" 2>&1 >/dev/null; printf "\\0"; ' \
+                 'done'
+        command = self.xal_session.sh(
+            'LC_ALL=C xargs -0 -r sh -c {script} sh'.format(
+                script=pipes.quote(script)),
+            stdin=''.join([path + '\0' for path in local_paths]))
+        messages = self.xal_session.sh.run(command).stdout.split('\0')
+        codes = []
+        for index in range(len(local_paths)):
+            message = messages[index].strip() if index < len(messages) else ''
+            if not message:
+                codes.append(errno.ENOENT)
+                continue
+            reason = message.splitlines()[-1].rpartition(': ')[2]
+            codes.append(STRERROR_CODES.get(reason, errno.EIO))
+        return codes
+
+    #: Remote commands computing digests, per :mod:`hashlib` algorithm.
+    checksum_commands = {
+        'md5': 'md5sum',
+        'sha1': 'sha1sum',
+        'sha224': 'sha224sum',
+        'sha256': 'sha256sum',
+        'sha384': 'sha384sum',
+        'sha512': 'sha512sum',
+    }
+
+    def checksum(self, path, algorithm='sha256'):
+        """Return hexadecimal digest of file at ``path``, computed on remote
+        host."""
+        result = self.checksum_many([path], algorithm)[0]
+        if isinstance(result, OSError):
+            raise result
+        return result
+
+    def checksum_many(self, paths, algorithm='sha256'):
+        """Return list of digests (or :class:`OSError`) of ``paths``.
+
+        Files are hashed on remote host, in one command: paths are sent on
+        stdin, NUL-separated, and each one gets a line of output, digest or
+        error code. Content is not transferred.
 
+        Algorithms without remote command (see :attr:`checksum_commands`)
+        fall back to reading files.
+
+        """
+        try:
+            program = self.checksum_commands[algorithm]
+        except KeyError:
+            return super(FabricPathProvider, self).checksum_many(paths,
+                                                                 algorithm)
+        local_paths = [str(self.resolve(path)) for path in paths]
+        if not local_paths:
+            return []
+        script = 'for f; do ' \
+                 'if [ -d "$f" ]; then echo EISDIR; ' \
+                 'elif [ ! -e "$f" ]; then echo ENOENT; ' \
+                 'else {program} < "$f" || echo EACCES; fi; ' \
+                 'done'.format(program=program)
+        command = self.xal_session.sh(
+            'xargs -0 -r sh -c {script} sh'.format(
+                script=pipes.quote(script)),
+            stdin=''.join([path + '\0' for path in local_paths]))
+        lines = self.xal_session.sh.run(command).stdout.splitlines()
+        results = []
+        for index, path in enumerate(paths):
+            fields = lines[index].split() if index < len(lines) else []
+            if fields and not fields[0].startswith('E'):
+                results.append(fields[0])
+            else:
+                code = getattr(errno, fields[0] if fields else '',
+                               errno.EIO)
+                results.append(OSError(code, os.strerror(code), str(path)))
+        return results
+
+    @invalidates('path')
     def chmod(self, path, mode):
         local_path = self.resolve(path)
         local_mode = '{mode:o}'.format(mode=mode)
         cmd = 'chmod {mode} {path}' \
-              .format(path=local_path, mode=local_mode)
-        self.xal_session.sh.run(cmd)
+              .format(path=pipes.quote(str(local_path)), mode=local_mode)
+        self.run_mutation('chmod', path, cmd)
         return None
 
-    def glob(self, path, pattern):
-        local_path = self.resolve(path)
-        cmd = 'shopt -s globstar; cd {path} && ls {pattern}' \
-              .format(path=local_path, pattern=pattern)
-        result = self.xal_session.sh.run(cmd)
-        result = result.stdout.strip().split('\n')
-        result = [path / self(p) for p in result]  # Convert to Path objects.
-        return result
+    def run_mutation(self, name, path, command):
+        """Run shell ``command``, which performs operation ``name`` on
+        ``path``.
 
+        Within :meth:`batch` blocks, command is recorded in
+        :attr:`current_batch` instead.
+
+        """
+        if self.current_batch is not None:
+            self.current_batch.record(name, path, command)
+        else:
+            self.xal_session.sh.run(command)
+
+    def find(self, path, arguments, format='%P'):
+        """Run ``find`` on ``path``, yield records as they stream.
+
+        ``arguments`` are tests of ``find`` (text). Records are formatted
+        with ``-printf format``, NUL-separated, so that they can hold any
+        name. If iteration stops early, the command is killed.
+
+        Raise :class:`OSError` if ``path`` cannot be listed at all.
+
+        """
+        local_path = self.resolve(path)
+        cmd = "find {path} {arguments} -printf '{format}\\0'".format(
+            path=pipes.quote(str(local_path) + '/'),
+            arguments=arguments,
+            format=format)
+        result = self.xal_session.sh.stream(cmd)
+        found = False
+        try:
+            for record in result.iter_records():
+                found = True
+                yield record
+        finally:
+            if not result.done:
+                result.kill()
+        if not found and not result.succeeded:
+            message = result.stderr.strip()
+            if 'Not a directory' in message:
+                code = errno.ENOTDIR
+            elif 'Permission denied' in message:
+                code = errno.EACCES
+            else:
+                code = errno.ENOENT
+            raise OSError(code, os.strerror(code), str(path))
+
+    def glob(self, path, pattern, limit=None):
+        """Yield paths under ``path`` matching ``pattern``, as they are found.
+
+        A single ``find`` command lists candidates, bounded in depth, and
+        filtered by name on the remote side. Output streams: matches are
+        yielded as soon as they are received. They are checked with
+        :func:`xal.path.globbing.match_names`, as local paths are. At most
+        ``limit`` paths are yielded, if set; then ``find`` is killed.
+
+        """
+        selectors = compile_pattern(pattern)
+        root = self(str(path))
+        if limit == 0:
+            return
+        # Start from literal prefix, such as 'tests' in 'tests/*/*.txt'.
+        prefix = []
+        while len(selectors) > 1 and selectors[0][0] == 'literal':
+            prefix.append(selectors.pop(0)[1])
+        start = root
+        for name in prefix:
+            start = start / self(name)
+        # Bound depth, filter names. Minimum depth is 0 if pattern is
+        # ``**``, which matches start.
+        kinds = [kind for kind, value in selectors]
+        arguments = ['-mindepth {depth}'.format(
+            depth=len(kinds) - kinds.count('recursive'))]
+        if 'recursive' not in kinds:
+            arguments.append('-maxdepth {depth}'.format(depth=len(kinds)))
+        if kinds[-1] == 'recursive':
+            arguments.append('-type d')
+        else:
+            last_part = [part for part in pattern.split('/')
+                         if part not in ('', '.')][-1]
+            arguments.append('-name {name}'.format(
+                name=pipes.quote(last_part)))
+        records = self.find(start, ' '.join(arguments))
+        count = 0
+        try:
+            for relative_path in records:
+                names = relative_path.split('/') if relative_path else []
+                if not match_names(names, selectors):
+                    continue
+                yield start / self(relative_path)
+                count += 1
+                if count == limit:
+                    return
+        except OSError:  # As pathlib, yield nothing for missing directories.
+            return
+        finally:
+            records.close()
+
+    @cached
     def group(self, path):
         local_path = self.resolve(path)
         with fabric.context_managers.hide('running', 'stdout', 'stderr'):
@@ -159,31 +429,150 @@ class FabricPathProvider(PathProvider):
         return stat.S_ISCHR(mode)
 
     def iterdir(self, path):
+        """Yield children of ``path``, as ``find`` lists them."""
+        parent = self(str(path))
+        for name in self.find(path, '-mindepth 1 -maxdepth 1', format='%f'):
+            yield parent / self(name)
+
+    #: :meth:`find` format of :meth:`scandir` records: name, then type of
+    #: entry and type of symlink's target.
+    scandir_format = '%f\\0%y%Y'
+
+    #: :meth:`find` format of :meth:`scandir` records with stat results.
+    #: After types: permission bits (octal) then other fields of
+    #: :class:`posix.stat_result`, not following symlinks.
+    scandir_stat_format = '%f\\0%y%Y %m %i %D %n %U %G %s %A@ %T@ %C@'
+
+    def scandir(self, path, stat=False):
+        """Yield :class:`~xal.path.entry.PathEntry` for children of ``path``.
+
+        Children are listed by a single :meth:`find` command, which writes
+        NUL-separated records with types and, if ``stat`` is true, stat
+        results. Entries are yielded as they stream.
+
+        """
+        parent = self(str(path))
+        records = self.find(
+            path, '-mindepth 1 -maxdepth 1',
+            format=self.scandir_stat_format if stat else self.scandir_format)
+        for name in records:
+            fields = next(records).split(' ')
+            type = FIND_TYPES.get(fields[0][0])
+            lstat = None
+            if stat:
+                mode = int(fields[1], base=8) | (type or 0)
+                lstat = posix.stat_result(
+                    [mode] + [int(float(field)) for field in fields[2:]])
+            yield PathEntry(parent / self(name), name, type,
+                            target_type=FIND_TYPES.get(fields[0][1]),
+                            lstat=lstat)
+
+    def walk(self, path, workers=None, onerror=None):
+        """Yield ``(directory, subdirs, files)`` for ``path`` and subdirs.
+
+        The tree is traversed by a single ``find`` command, whose output is
+        parsed as it streams. ``workers`` is ignored. Since ``find`` lists
+        a directory then walks its subdirectories, a directory is complete
+        once the traversal left it: directories are yielded bottom-up, and
+        changing ``subdirs`` does not prune the walk.
+
+        Symlinks to directories are listed in ``subdirs`` but not walked.
+        If ``find`` fails, ``onerror`` is called, if set, with an
+        :class:`OSError`. If iteration stops early, ``find`` is killed.
+
+        """
         local_path = self.resolve(path)
-        cmd = 'ls -1v {path}'.format(path=local_path)
-        result = self.xal_session.sh.run(cmd)
-        result = result.stdout.strip().split('\n')
-        for sub_path in result:
-            yield path / self(sub_path)
-
+        cmd = "find {path} -mindepth 1 -printf '%y%Y\\0%P\\0'".format(
+            path=pipes.quote(str(local_path) + '/'))
+        result = self.xal_session.sh.stream(cmd)
+        root = self(str(path))
+        records = result.iter_records()
+        stack = [('', [], [])]  # Directories not complete yet.
+        try:
+            for types in records:
+                relative_path = next(records)
+                parent, _, name = relative_path.rpartition('/')
+                while stack[-1][0] != parent:
+                    directory, subdirs, files = stack.pop()
+                    yield root / self(directory or '.'), subdirs, files
+                if types[1] == 'd':
+                    stack[-1][1].append(name)
+                else:
+                    stack[-1][2].append(name)
+                if types[0] == 'd':
+                    stack.append((relative_path, [], []))
+        finally:
+            if not result.done:  # Iteration stopped early.
+                result.kill()
+        if not result.succeeded:
+            if onerror is not None:
+                onerror(OSError(result.stderr.strip()))
+            if stack == [('', [], [])]:  # Root could not be listed.
+                return
+        while stack:
+            directory, subdirs, files = stack.pop()
+            yield root / self(directory or '.'), subdirs, files
+
+    @invalidates('path')
     def lchmod(self, path, mode):
         raise NotImplementedError()
 
     def lstat(self, path):
         raise NotImplementedError()
 
+    @invalidates('path')
     def rmdir(self, path):
         local_path = self.resolve(path)
-        cmd = 'rmdir {path}'.format(path=local_path)
-        self.xal_session.sh.run(cmd)
+        cmd = 'rmdir {path}'.format(path=pipes.quote(str(local_path)))
+        self.run_mutation('rmdir', path, cmd)
         return None
 
+    #: Size of SFTP requests of files returned by :meth:`open`, in bytes.
+    sftp_request_size = sftp.REQUEST_SIZE
+
+    #: Maximum size of reads in flight, per file, in bytes: sequential reads
+    #: are prefetched ahead.
+    sftp_read_ahead = sftp.READ_AHEAD
+
+    #: Maximum size of writes in flight, per file, in bytes: writes are sent
+    #: without waiting for responses.
+    sftp_write_behind = sftp.WRITE_BEHIND
+
     def open(self, path, mode='r', buffering=-1, encoding=None, errors=None,
              newline=None):
-        local_path = self.resolve(path)
-        return self.xal_session.client.ssh_client.open(
-            unicode(local_path), mode)
+        """Open remote file, return :class:`xal.path.sftp.SFTPFile`, or a
+        text wrapper around it.
 
+        Files keep several SFTP requests in flight, see
+        :attr:`sftp_read_ahead` and :attr:`sftp_write_behind`. If
+        ``buffering`` is 0, requests are sent one at a time. If it is greater
+        than 1, writes are sent once ``buffering`` bytes are buffered.
+
+        """
+        if self.cache is not None and set(mode) & set('wax+'):
+            self.cache.invalidate(self.cache_key(path))
+        local_path = self.resolve(path)
+        raw_mode = mode.replace('b', '').replace('t', '')
+        sftp_file = self.xal_session.client.ssh_client.open(
+            unicode(local_path), raw_mode)
+        options = {
+            'request_size': self.sftp_request_size,
+            'read_ahead': self.sftp_read_ahead,
+            'write_behind': self.sftp_write_behind,
+        }
+        if buffering == 0:
+            options.update(read_ahead=0, write_behind=0, buffer_size=1)
+        elif buffering > 1:
+            options['buffer_size'] = buffering
+        file_obj = sftp.SFTPFile(sftp_file, mode=raw_mode,
+                                 name=str(local_path), **options)
+        if 'b' in mode:
+            return file_obj
+        return io.TextIOWrapper(file_obj, encoding=encoding, errors=errors,
+                                newline=newline,
+                                line_buffering=buffering == 1)
+
+    @cached
     def owner(self, path):
         local_path = self.resolve(path)
         cmd = "ls -ld {path} | awk '{{print $3}}'".format(path=local_path)
@@ -192,6 +581,7 @@ class FabricPathProvider(PathProvider):
             return result.stdout.strip()
         raise KeyError()
 
+    @invalidates('path', 'target')
     def rename(self, path, target):
         local_path = self.resolve(path)
         local_target = self.resolve(target)
@@ -200,6 +590,7 @@ class FabricPathProvider(PathProvider):
                 unicode(local_path),
                 unicode(local_target))
 
+    @invalidates('path', 'target')
     def replace(self, path, target):
         local_path = self.resolve(path)
         local_target = self.resolve(target)
@@ -208,27 +599,97 @@ class FabricPathProvider(PathProvider):
                 unicode(local_path),
                 unicode(local_target))
 
-    def rglob(self, path, pattern):
-        recursive_pattern = '**/{pattern}'.format(pattern=pattern)
-        return self.glob(path, recursive_pattern)
+    def rglob(self, path, pattern, limit=None):
+        return self.glob(path, rglob_pattern(pattern), limit=limit)
 
+    @invalidates('path')
     def symlink_to(self, path, target, target_is_directory=False):
         local_path = self.resolve(path)
         local_target = self.resolve(target)
+        if self.current_batch is not None:
+            self.current_batch.record(
+                'symlink_to', path, 'ln -s {target} {path}'.format(
+                    target=pipes.quote(str(local_target)),
+                    path=pipes.quote(str(local_path))))
+            return None
         with fabric.context_managers.hide('running', 'stdout', 'stderr'):
             fabtools.files.symlink(unicode(local_target), unicode(local_path))
         return None
 
+    @invalidates('path')
     def touch(self, path, mode=0o777, exist_ok=True):
         local_path = self.resolve(path)
-        cmd = "touch {path}".format(path=local_path)
-        self.xal_session.sh.run(cmd)
+        cmd = "touch {path}".format(path=pipes.quote(str(local_path)))
+        self.run_mutation('touch', path, cmd)
         if mode is not None:
             self.chmod(path, mode)
         return self(path)
 
+    def run_delta(self, command, path, block_size, stdin=None):
+        """Run :mod:`xal.path.delta` as a script with remote Python, return
+        result.
+
+        Raise :class:`NotImplementedError` if Python is not available on
+        remote host, and :class:`OSError` if command fails.
+
+        """
+        cmd = 'PYTHON=$(command -v python3 || command -v python) ' \
+              '|| exit 127; "$PYTHON" -c {source} {command} {path} {size}' \
+              .format(source=pipes.quote(inspect.getsource(delta)),
+                      command=command,
+                      path=pipes.quote(str(self.resolve(path))),
+                      size=int(block_size))
+        result = self.xal_session.sh.run(self.xal_session.sh(cmd, stdin=stdin))
+        if result.return_code == 127:
+            raise NotImplementedError('Python is not available on remote '
+                                      'host.')
+        if not result.succeeded:
+            raise OSError(result.decode(name='stderr').strip())
+        return result
+
+    def block_signatures(self, path, block_size=delta.BLOCK_SIZE):
+        """Return checksums of blocks of file at ``path``, computed on
+        remote host."""
+        result = self.run_delta('signatures', path, block_size)
+        signatures = []
+        for line in result.stdout.splitlines():
+            weak, strong = line.split(' ')
+            signatures.append((int(weak), strong))
+        return signatures
+
+    @invalidates('path')
+    def patch(self, path, instructions, block_size=delta.BLOCK_SIZE):
+        """Rebuild file at ``path`` from delta ``instructions``, on remote
+        host: only data not found in the file is sent."""
+        self.run_delta('patch', path, block_size,
+                       stdin=delta.encode(instructions))
+
+    @invalidates('path')
+    def utime(self, path, times=None):
+        """Set access and modification times of ``path``, or current time.
+
+        Times are truncated to seconds.
+
+        """
+        local_path = pipes.quote(str(self.resolve(path)))
+        if times is None:
+            cmd = 'touch -c {path}'.format(path=local_path)
+        else:
+            cmd = 'touch -c -a -d @{atime} {path} && ' \
+                  'touch -c -m -d @{mtime} {path}' \
+                  .format(path=local_path,
+                          atime=int(times[0]),
+                          mtime=int(times[1]))
+        self.xal_session.sh.run(cmd)
+        return None
+
+    @invalidates('path')
     def unlink(self, path):
         local_path = self.resolve(path)
+        if self.current_batch is not None:
+            self.current_batch.record('unlink', path, 'rm {path}'.format(
+                path=pipes.quote(str(local_path))))
+            return None
         with fabric.context_managers.hide('running', 'stdout', 'stderr'):
             fabtools.files.remove(unicode(local_path))
         return None
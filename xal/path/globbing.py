@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""Lazy glob engine for local filesystem, built on :func:`os.scandir`.
+
+Patterns follow :meth:`pathlib.Path.glob` syntax: parts are separated by
+``/``, ``**`` matches the directory and all its subdirectories, recursively.
+
+Matches are yielded as directories are walked. Each directory is listed
+once, types of entries come with the listing, and directories which cannot
+match the rest of the pattern are not entered.
+
+"""
+import fnmatch
+import itertools
+import os
+import re
+
+try:
+    from os import scandir
+except ImportError:  # Python<3.5 fallback
+    from scandir import scandir
+
+
+#: Characters which make a pattern part a wildcard.
+MAGIC_CHARACTERS = '*?['
+
+
+def iglob(root, pattern, limit=None):
+    """Yield paths (text) under ``root`` matching ``pattern``.
+
+    Paths are joined to ``root`` as given, so they are relative if ``root``
+    is. At most ``limit`` paths are yielded, if set.
+
+    """
+    selectors = compile_pattern(pattern)
+    root = str(root)
+    if root == '.':
+        root = ''
+    matches = (match or '.' for match in select(root, selectors))
+    if [kind for kind, value in selectors].count('recursive') > 1:
+        matches = unique(matches)  # Same path may be reached several times.
+    if limit is not None:
+        matches = itertools.islice(matches, limit)
+    return matches
+
+
+def compile_pattern(pattern):
+    """Return list of selectors (see :func:`compile_part`) for ``pattern``.
+
+    Raise :class:`ValueError` if pattern is empty, and
+    :class:`NotImplementedError` if it is absolute, as :mod:`pathlib` does.
+
+    """
+    if pattern.startswith('/'):
+        raise NotImplementedError("Non-relative patterns are unsupported")
+    parts = [part for part in pattern.split('/') if part not in ('', '.')]
+    if not parts:
+        raise ValueError(
+            "Unacceptable pattern: {pattern!r}".format(pattern=pattern))
+    return [compile_part(part) for part in parts]
+
+
+def match_names(names, selectors):
+    """Return whether list of path ``names`` matches ``selectors``.
+
+    Used by engines which list candidates and filter them afterwards. Checks
+    names only: that intermediate names are directories is up to the
+    listing.
+
+    """
+    if not selectors:
+        return not names
+    kind, value = selectors[0]
+    if kind == 'recursive':
+        return any(match_names(names[index:], selectors[1:])
+                   for index in range(len(names) + 1))
+    if not names:
+        return False
+    if kind == 'literal':
+        matched = names[0] == value
+    else:
+        matched = value(names[0]) is not None
+    return matched and match_names(names[1:], selectors[1:])
+
+
+def rglob_pattern(pattern):
+    """Return glob pattern for recursive ``pattern``, as in ``rglob()``."""
+    return '**/{pattern}'.format(pattern=pattern)
+
+
+def compile_part(part):
+    """Return ``(kind, value)`` selector for pattern ``part``.
+
+    ``kind`` is ``'recursive'`` for ``**``, ``'wildcard'`` (with compiled
+    regular expression's ``match``) or ``'literal'`` (with name).
+
+    """
+    if part == '**':
+        return ('recursive', None)
+    if any(character in part for character in MAGIC_CHARACTERS):
+        return ('wildcard', re.compile(fnmatch.translate(part)).match)
+    return ('literal', part)
+
+
+def list_entries(path):
+    """Return list of entries of ``path``, empty if it cannot be listed.
+
+    Listing is read at once, so that no file descriptor stays open while
+    subdirectories are walked.
+
+    """
+    try:
+        return list(scandir(path or '.'))
+    except OSError:  # Not a directory, permission denied, vanished...
+        return []
+
+
+def select(path, selectors, entries=None):
+    """Yield paths under ``path`` matching ``selectors``.
+
+    ``entries`` is the listing of ``path``, if already read.
+
+    """
+    kind, value = selectors[0]
+    rest = selectors[1:]
+    if kind == 'recursive':
+        for directory, directory_entries in walk_directories(path, entries):
+            if rest:
+                for match in select(directory, rest, directory_entries):
+                    yield match
+            else:
+                yield directory
+    elif kind == 'literal':
+        child = os.path.join(path, value)
+        if rest:
+            if os.path.isdir(child):
+                for match in select(child, rest):
+                    yield match
+        elif os.path.exists(child):
+            yield child
+    else:
+        if entries is None:
+            entries = list_entries(path)
+        for entry in entries:
+            if rest and not entry.is_dir():  # Prune.
+                continue
+            if not value(entry.name):
+                continue
+            child = os.path.join(path, entry.name)
+            if rest:
+                for match in select(child, rest):
+                    yield match
+            else:
+                yield child
+
+
+def directory_id(path, entry=None):
+    """Return ``(st_dev, st_ino)`` of directory ``path``, following
+    symlinks, or ``None`` if it cannot be read. ``entry`` is its
+    :func:`scandir` entry, if any."""
+    try:
+        if entry is None:
+            stat_result = os.stat(path or '.')
+        else:
+            stat_result = entry.stat()
+    except OSError:
+        return None
+    return (stat_result.st_dev, stat_result.st_ino)
+
+
+def walk_directories(path, entries=None, ancestors=None):
+    """Yield ``(directory, entries)`` for ``path`` and its subdirectories.
+
+    Symlinks to directories are followed, as :mod:`pathlib` does. Loops are
+    avoided: directories which are ancestors of themselves (``ancestors``
+    is the set of their :func:`directory_id`) are not walked again.
+    Listings are yielded, so that callers do not read them again.
+
+    """
+    if entries is None:
+        entries = list_entries(path)
+    if ancestors is None:
+        ancestors = frozenset([directory_id(path)])
+    yield path, entries
+    for entry in entries:
+        if not entry.is_dir():
+            continue
+        child = os.path.join(path, entry.name)
+        identity = directory_id(child, entry)
+        if identity is None or identity in ancestors:  # Symlink loop.
+            continue
+        for item in walk_directories(child,
+                                     ancestors=ancestors | set([identity])):
+            yield item
+
+
+def unique(paths):
+    """Yield ``paths``, skipping duplicates."""
+    seen = set()
+    for path in paths:
+        if path not in seen:
+            seen.add(path)
+            yield path
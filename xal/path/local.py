@@ -3,15 +3,107 @@
 Mostly wrappers around Python builtins: pathlib, os, os.path, shutil...
 
 """
+import hashlib
+import mmap
+import multiprocessing
 import os
 import pathlib
 import shutil
+import threading
+
+try:
+    import queue
+except ImportError:  # Python 2 fallback
+    import Queue as queue
+
+try:
+    from os import scandir
+except ImportError:  # Python<3.5 fallback
+    from scandir import scandir
+
+from xal.path import delta
+from xal.path.cache import cached, invalidates
+from xal.path.entry import PathEntry
+from xal.path.globbing import iglob, rglob_pattern
+from xal.path.provider import PathProvider, as_os_error
+
+
+class LocalPathEntry(PathEntry):
+    """Directory entry wrapping :class:`os.DirEntry`, which caches type
+    and stat results itself."""
+    def __init__(self, path, dir_entry):
+        self.path = path
+        self.name = dir_entry.name
+        #: Wrapped :class:`os.DirEntry`.
+        self.dir_entry = dir_entry
+
+    def is_dir(self, follow_symlinks=True):
+        return self.dir_entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_file(self, follow_symlinks=True):
+        return self.dir_entry.is_file(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self):
+        return self.dir_entry.is_symlink()
+
+    def stat(self, follow_symlinks=True):
+        return self.dir_entry.stat(follow_symlinks=follow_symlinks)
+
+    def inode(self):
+        return self.dir_entry.inode()
+
+
+def hash_file(path, algorithm='sha256'):
+    """Return hexadecimal digest of content of file at ``path``.
+
+    Regular files are mapped in memory and hashed in one call: no copies
+    through Python buffers, and pages are read ahead by the system. Other
+    files (empty, or special files) are read.
+
+    """
+    hasher = hashlib.new(algorithm)
+    with open(path, 'rb') as file_obj:
+        if os.fstat(file_obj.fileno()).st_size:
+            mapped = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                hasher.update(mapped)
+            finally:
+                mapped.close()
+        else:
+            for data in iter(lambda: file_obj.read(delta.CHUNK_SIZE), b''):
+                hasher.update(data)
+    return hasher.hexdigest()
+
+
+def hash_file_or_error(arguments):
+    """Return :func:`hash_file` of ``(path, algorithm)``, or error raised,
+    as :class:`OSError`.
 
-from xal.path.provider import PathProvider
+    Used by processes of :meth:`LocalPathProvider.checksum_many`.
+
+    """
+    try:
+        return hash_file(*arguments)
+    except EnvironmentError as exception:
+        return as_os_error(exception)
 
 
 class LocalPathProvider(PathProvider):
     """Local path manager."""
+    #: Default number of threads listing directories in :meth:`walk`. On
+    #: network filesystems, metadata latency dominates: listing several
+    #: directories at once pays off.
+    walk_workers = 8
+
+    #: Default number of processes hashing files in :meth:`checksum_many`.
+    #: ``None`` means one per CPU.
+    checksum_workers = None
+
+    #: :meth:`checksum_many` hashes files in a pool of processes if their
+    #: total size, in bytes, reaches this threshold. Smaller sets are hashed
+    #: in current process, which costs less than starting a pool.
+    checksum_pool_threshold = 64 * 1024 * 1024
+
     def cwd(self):
         """Return resource representing current working directory."""
         return self(str(pathlib.Path.cwd()))
@@ -27,6 +119,7 @@ class LocalPathProvider(PathProvider):
         os.chdir(str(local_path))
         return new_path
 
+    @cached
     def exists(self, path):
         local_path = pathlib.Path(str(path))
         return local_path.exists()
@@ -38,10 +131,15 @@ class LocalPathProvider(PathProvider):
     def is_relative(self):
         return not self.is_absolute()
 
+    @invalidates('path')
     def mkdir(self, path, mode=0o777, parents=False):
         local_path = self.resolve(str(path))
         local_path = pathlib.Path(str(local_path))
-        local_path.mkdir(mode=mode, parents=parents)
+        try:
+            local_path.mkdir(mode=mode, parents=parents)
+        finally:
+            if parents and self.cache is not None:
+                self.cache.invalidate(self.cache_key(path), ancestors=True)
         return self(str(local_path))
 
     def name(self, path):
@@ -56,6 +154,10 @@ class LocalPathProvider(PathProvider):
         local_path = pathlib.Path(str(path))
         return self(super(local_path.relative_to(other)))
 
+    def cache_key(self, path):
+        """Return absolute path, as text, without filesystem access."""
+        return os.path.abspath(str(path))
+
     def resolve(self, path):
         local_path = pathlib.Path(str(path))
         if not local_path.is_absolute():
@@ -64,6 +166,7 @@ class LocalPathProvider(PathProvider):
             local_path = local_path.resolve()
         return self(str(local_path))
 
+    @invalidates('path')
     def rm(self, path):
         local_path = pathlib.Path(str(path))
         if local_path.is_dir():
@@ -75,27 +178,58 @@ class LocalPathProvider(PathProvider):
         """Return True if session is local."""
         return session.is_local
 
+    @cached
     def stat(self, path):
         local_path = pathlib.Path(str(path))
         return local_path.stat()
 
+    def stat_many(self, paths):
+        """Return list of stat results (or :class:`OSError`) of ``paths``.
+
+        Plain loop over :func:`os.stat`, without intermediate pathlib
+        objects.
+
+        """
+        results = []
+        stat = os.stat
+        for path in paths:
+            try:
+                results.append(stat(str(path)))
+            except OSError as exception:
+                results.append(exception)
+        return results
+
+    def exists_many(self, paths):
+        """Return list of booleans telling whether ``paths`` exist."""
+        exists = os.path.exists
+        return [exists(str(path)) for path in paths]
+
+    @invalidates('path')
     def chmod(self, path, mode):
         local_path = pathlib.Path(str(path))
         return local_path.chmod(mode)
 
-    def glob(self, path, pattern):
-        local_path = pathlib.Path(str(path))
-        matches = local_path.glob(pattern)
-        return [self(str(match)) for match in matches]
+    def glob(self, path, pattern, limit=None):
+        """Yield paths under ``path`` matching ``pattern``, as they are found.
+
+        See :mod:`xal.path.globbing`. At most ``limit`` paths are yielded, if
+        set.
 
+        """
+        for match in iglob(str(path), pattern, limit=limit):
+            yield self(match)
+
+    @cached
     def group(self, path):
         local_path = pathlib.Path(str(path))
         return local_path.group()
 
+    @cached
     def is_dir(self, path):
         local_path = pathlib.Path(str(path))
         return local_path.is_dir()
 
+    @cached
     def is_file(self, path):
         local_path = pathlib.Path(str(path))
         return local_path.is_file()
@@ -125,6 +259,90 @@ class LocalPathProvider(PathProvider):
         for sub_local_path in local_path.iterdir():
             yield self(str(sub_local_path))
 
+    def scandir(self, path, stat=False):
+        """Yield :class:`LocalPathEntry` for children of ``path``.
+
+        Uses :func:`os.scandir`: types come with the listing. If ``stat`` is
+        true, entries are stat'ed (without following symlinks) as they are
+        listed.
+
+        """
+        for dir_entry in scandir(str(path)):
+            if stat:
+                dir_entry.stat(follow_symlinks=False)
+            yield LocalPathEntry(self(dir_entry.path), dir_entry)
+
+    def walk(self, path, workers=None, onerror=None):
+        """Yield ``(directory, subdirs, files)`` for ``path`` and subdirs.
+
+        Like :func:`os.walk`, top-down: ``directory`` is a
+        :class:`~xal.path.resource.Path`, ``subdirs`` and ``files`` are lists
+        of names, and removing names from ``subdirs`` prunes the walk.
+        Symlinks to directories are listed in ``subdirs`` but not walked.
+
+        Directories are listed by a pool of ``workers`` threads (defaults to
+        :attr:`walk_workers`), so they are yielded in no particular order.
+        Subdirectories are scheduled when the walk resumes after their
+        parent was yielded.
+
+        Errors are ignored, unless ``onerror`` is set: it is called with the
+        :class:`OSError` instance.
+
+        """
+        if workers is None:
+            workers = self.walk_workers
+        tasks = queue.Queue()
+        listings = queue.Queue()
+
+        def work():
+            while True:
+                directory = tasks.get()
+                if directory is None:
+                    return
+                try:
+                    listings.put((directory, list(scandir(directory)), None))
+                except OSError as exception:
+                    listings.put((directory, None, exception))
+
+        threads = [threading.Thread(target=work) for i in range(workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        tasks.put(str(path))
+        pending = 1
+        try:
+            while pending:
+                directory, entries, error = listings.get()
+                pending -= 1
+                if error is not None:
+                    if onerror is not None:
+                        onerror(error)
+                    continue
+                subdirs = []
+                files = []
+                links = set()
+                for entry in entries:
+                    if entry.is_dir():
+                        subdirs.append(entry.name)
+                        if entry.is_symlink():
+                            links.add(entry.name)
+                    else:
+                        files.append(entry.name)
+                yield self(directory), subdirs, files
+                for name in subdirs:
+                    if name not in links:
+                        tasks.put(os.path.join(directory, name))
+                        pending += 1
+        finally:
+            try:  # Drop directories not listed yet, then stop threads.
+                while True:
+                    tasks.get_nowait()
+            except queue.Empty:
+                pass
+            for thread in threads:
+                tasks.put(None)
+
+    @invalidates('path')
     def lchmod(self, path, mode):
         local_path = pathlib.Path(str(path))
         return local_path.lchmod(mode)
@@ -133,12 +351,15 @@ class LocalPathProvider(PathProvider):
         local_path = pathlib.Path(str(path))
         return local_path.lstat()
 
+    @invalidates('path')
     def rmdir(self, path):
         local_path = pathlib.Path(str(path))
         return local_path.rmdir()
 
     def open(self, path, mode='r', buffering=-1, encoding=None, errors=None,
              newline=None):
+        if self.cache is not None and set(mode) & set('wax+'):
+            self.cache.invalidate(self.cache_key(path))
         local_path = pathlib.Path(str(path))
         return local_path.open(
             mode=mode,
@@ -148,15 +369,18 @@ class LocalPathProvider(PathProvider):
             newline=newline,
         )
 
+    @cached
     def owner(self, path):
         local_path = pathlib.Path(str(path))
         return local_path.owner()
 
+    @invalidates('path', 'target')
     def rename(self, path, target):
         local_path = pathlib.Path(str(path))
         local_target = pathlib.Path(str(target))
         return local_path.rename(local_target)
 
+    @invalidates('path', 'target')
     def replace(self, path, target):
         local_path = pathlib.Path(str(path))
         local_target = pathlib.Path(str(target))
@@ -166,21 +390,79 @@ class LocalPathProvider(PathProvider):
             local_target.unlink()
             return local_path.rename(target)
 
-    def rglob(self, path, pattern):
-        local_path = pathlib.Path(str(path))
-        matches = local_path.rglob(pattern)
-        return [self(str(match)) for match in matches]
+    def rglob(self, path, pattern, limit=None):
+        return self.glob(path, rglob_pattern(pattern), limit=limit)
 
+    @invalidates('path')
     def symlink_to(self, path, target, target_is_directory=False):
         local_path = pathlib.Path(str(path))
         local_target = pathlib.Path(str(target))
         return local_path.symlink_to(local_target)
 
+    @invalidates('path')
     def touch(self, path, mode=0o777, exist_ok=True):
         local_path = pathlib.Path(str(path))
         local_path.touch(mode=mode, exist_ok=exist_ok)
         return self(str(local_path))
 
+    def checksum(self, path, algorithm='sha256'):
+        """Return hexadecimal digest of file at ``path``, see
+        :func:`hash_file`."""
+        return hash_file(str(path), algorithm)
+
+    def checksum_many(self, paths, algorithm='sha256', workers=None):
+        """Return list of digests (or :class:`OSError`) of ``paths``.
+
+        Files are hashed by a pool of ``workers`` processes (defaults to
+        :attr:`checksum_workers`), so that large sets use all CPUs. Sets
+        smaller than :attr:`checksum_pool_threshold` are hashed in current
+        process.
+
+        """
+        tasks = [(str(path), algorithm) for path in paths]
+        hashlib.new(algorithm)  # Raise ValueError early if unknown.
+        if workers is None:
+            workers = self.checksum_workers
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        total_size = 0
+        for stat_result in self.stat_many(path for path, _ in tasks):
+            if not isinstance(stat_result, OSError):
+                total_size += stat_result.st_size
+        if len(tasks) < 2 or workers < 2 \
+                or total_size < self.checksum_pool_threshold:
+            return [hash_file_or_error(task) for task in tasks]
+        pool = multiprocessing.Pool(min(workers, len(tasks)))
+        try:
+            results = pool.map(hash_file_or_error, tasks, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
+        return results
+
+    def mmap(self, path):
+        """Return read-only :class:`mmap.mmap` of file at ``path``.
+
+        Content is paged in by the system as it is accessed. With Python 3,
+        wrap it in a :class:`memoryview` to slice it without copies. Close it
+        when done.
+        Empty files cannot be mapped (:class:`ValueError`).
+
+        """
+        with open(str(path), 'rb') as file_obj:
+            return mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @invalidates('path')
+    def patch(self, path, instructions, block_size=delta.BLOCK_SIZE):
+        """Rebuild file at ``path`` from delta ``instructions``, atomically.
+        """
+        delta.patch_path(str(path), instructions, block_size)
+
+    @invalidates('path')
+    def utime(self, path, times=None):
+        return os.utime(str(path), times)
+
+    @invalidates('path')
     def unlink(self, path):
         local_path = pathlib.Path(str(path))
         return local_path.unlink()
@@ -1,11 +1,40 @@
 # -*- coding: utf-8 -*-
 """Base stuff for providers that handle Path objects (pathlib API)."""
+import contextlib
+import hashlib
+import posixpath
+
 from xal.provider import ResourceProvider
+from xal.path import delta, sync, transfer
+from xal.path.batch import PathBatch
+from xal.path.cache import PathMetadataCache
 from xal.path.resource import Path
 
 
+def as_os_error(exception):
+    """Return ``exception`` as :class:`OSError`.
+
+    With Python 2, file operations raise :class:`IOError`, which is not an
+    :class:`OSError`.
+
+    """
+    if isinstance(exception, OSError):
+        return exception
+    if exception.errno is None:
+        return OSError(str(exception))
+    return OSError(exception.errno, exception.strerror, exception.filename)
+
+
 class PathProvider(ResourceProvider):
     """Base class for paths."""
+    #: :class:`~xal.path.cache.PathMetadataCache` where metadata of paths are
+    #: kept. ``None`` (default) disables caching.
+    cache = None
+
+    #: :class:`~xal.path.batch.PathBatch` recording mutations, within
+    #: :meth:`batch` blocks. ``None`` means mutations run immediately.
+    current_batch = None
+
     def __init__(self, resource_factory=Path):
         super(PathProvider, self).__init__(
             resource_factory=resource_factory)
@@ -30,6 +59,191 @@ class PathProvider(ResourceProvider):
     def abspath(self, path):
         raise NotImplementedError()
 
+    def stat_many(self, paths):
+        """Return list of stat results of ``paths``, in order.
+
+        Errors are captured per path: items of paths that cannot be stat'ed
+        are :class:`OSError` instances (not raised).
+
+        Providers override this method to gather results in a batch, such
+        as a single command in remote sessions.
+
+        """
+        results = []
+        for path in paths:
+            try:
+                results.append(self.stat(path))
+            except OSError as exception:
+                results.append(exception)
+        return results
+
+    def exists_many(self, paths):
+        """Return list of booleans telling whether ``paths`` exist."""
+        return [not isinstance(result, OSError)
+                for result in self.stat_many(paths)]
+
+    def scandir(self, path, stat=False):
+        """Yield :class:`~xal.path.entry.PathEntry` for children of ``path``.
+
+        Name and type of entries are gathered in one listing operation. If
+        ``stat`` is true, so are their stat results.
+
+        """
+        raise NotImplementedError()
+
+    def walk(self, path, workers=None, onerror=None):
+        """Yield ``(directory, subdirs, files)`` for ``path`` and subdirs.
+
+        ``directory`` is a :class:`~xal.path.resource.Path`, ``subdirs`` and
+        ``files`` are lists of names, as with :func:`os.walk`.
+
+        """
+        raise NotImplementedError()
+
+    def utime(self, path, times=None):
+        """Set ``(atime, mtime)`` of ``path``, as :func:`os.utime`."""
+        raise NotImplementedError()
+
+    def checksum(self, path, algorithm='sha256'):
+        """Return hexadecimal digest of content of file at ``path``.
+
+        ``algorithm`` is a name accepted by :func:`hashlib.new`.
+
+        """
+        hasher = hashlib.new(algorithm)
+        with self.open(path, 'rb') as file_obj:
+            while True:
+                data = file_obj.read(delta.CHUNK_SIZE)
+                if not data:
+                    break
+                hasher.update(data)
+        return hasher.hexdigest()
+
+    def checksum_many(self, paths, algorithm='sha256'):
+        """Return list of digests (or :class:`OSError`) of ``paths``."""
+        results = []
+        for path in paths:
+            try:
+                results.append(self.checksum(path, algorithm))
+            except EnvironmentError as exception:
+                results.append(as_os_error(exception))
+        return results
+
+    def read_bytes(self, path):
+        """Return content of file at ``path``, as bytes."""
+        with self.open(path, 'rb') as file_obj:
+            return file_obj.read()
+
+    def iter_chunks(self, path, size=transfer.CHUNK_SIZE):
+        """Yield content of file at ``path`` in chunks of at most ``size``
+        bytes.
+
+        Chunks are :class:`memoryview` instances of one buffer, which is
+        filled again at each iteration: nothing is allocated per chunk. A
+        chunk is valid until next iteration; copy it, with ``chunk.tobytes()``,
+        to keep it.
+
+        """
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        with self.open(path, 'rb') as file_obj:
+            readinto = getattr(file_obj, 'readinto', None)
+            while True:
+                if readinto is not None:
+                    length = readinto(buffer)
+                else:  # File objects without readinto(), copy.
+                    data = file_obj.read(size)
+                    length = len(data)
+                    buffer[:length] = data
+                if not length:
+                    return
+                yield view[:length]
+
+    def mmap(self, path):
+        """Return read-only :class:`mmap.mmap` of file at ``path``.
+
+        Only files of local sessions can be mapped in memory.
+
+        """
+        raise NotImplementedError()
+
+    def block_signatures(self, path, block_size=delta.BLOCK_SIZE):
+        """Return checksums of blocks of file at ``path``, see
+        :func:`xal.path.delta.signatures`."""
+        with self.open(path, 'rb') as file_obj:
+            return delta.signatures(file_obj, block_size)
+
+    def patch(self, path, instructions, block_size=delta.BLOCK_SIZE):
+        """Rebuild file at ``path`` from delta ``instructions``, see
+        :func:`xal.path.delta.delta`.
+
+        Mode and times of file are not kept.
+
+        """
+        raise NotImplementedError()
+
+    def sync(self, source, target, delete=False, checksum=False,
+             dry_run=False, delta_threshold=sync.DELTA_THRESHOLD):
+        """Synchronize ``target`` with ``source`` path of this session,
+        return :class:`~xal.path.sync.SyncReport`.
+
+        See :func:`xal.path.sync.sync`.
+
+        """
+        if not isinstance(source, Path) or source.xal_session is None:
+            source = self(str(source))
+        return sync.sync(source, target, delete=delete, checksum=checksum,
+                         dry_run=dry_run, delta_threshold=delta_threshold)
+
+    def cache_key(self, path):
+        """Return key of ``path`` in :attr:`cache`: absolute path, as text."""
+        return posixpath.normpath(str(self.resolve(path)))
+
+    @contextlib.contextmanager
+    def caching(self, ttl=60, max_size=1024):
+        """Context manager enabling :attr:`cache` within a block.
+
+        If a cache is already set, it is used as is. Else a new
+        :class:`~xal.path.cache.PathMetadataCache` is created, and dropped
+        on exit.
+
+        """
+        previous = self.cache
+        if previous is None:
+            self.cache = PathMetadataCache(ttl=ttl, max_size=max_size)
+        try:
+            yield self.cache
+        finally:
+            self.cache = previous
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Context manager recording mutations of paths, yields
+        :class:`~xal.path.batch.PathBatch`.
+
+        Providers which support it (remote ones) record mutations as shell
+        commands, and run them as a single script when the block exits, or
+        when batch's ``flush()`` is called. If an operation fails,
+        :class:`~xal.path.batch.PathBatchError` tells which call it was.
+        Other providers run mutations immediately.
+
+        If the block raises, operations not flushed yet are dropped. Nested
+        blocks join the outer batch.
+
+        """
+        if self.current_batch is not None:
+            yield self.current_batch
+            return
+        self.current_batch = PathBatch(self)
+        try:
+            yield self.current_batch
+        except BaseException:
+            self.current_batch.discard()
+            raise
+        finally:
+            batch, self.current_batch = self.current_batch, None
+        batch.flush()
+
     def pure_path(self, path):
         """Return Path instance not attached to a session."""
         path = self(path)
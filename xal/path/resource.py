@@ -3,6 +3,7 @@
 from __future__ import division
 import pathlib
 
+from xal.path import transfer
 from xal.resource import Resource
 
 
@@ -86,6 +87,10 @@ class Path(Resource):
         # Compare paths.
         return self.pure_path == other.pure_path
 
+    def __hash__(self):
+        # Equal paths have equal pure paths, whatever their sessions.
+        return hash(self.pure_path)
+
     def __cmp__(self, other):
         # Compare sessions.
         if self.xal_session and other.xal_session:
@@ -185,14 +190,66 @@ class Path(Resource):
     def stat(self):
         return self.xal_session.path.stat(self)
 
+    @classmethod
+    def stat_many(cls, paths):
+        """Return list of stat results of ``paths``, in order.
+
+        ``paths`` may be attached to several sessions: each session gets a
+        single ``stat_many()`` call for its paths. Items of paths that cannot
+        be stat'ed are :class:`OSError` instances.
+
+        """
+        return cls._dispatch_many('stat_many', paths)
+
+    @classmethod
+    def exists_many(cls, paths):
+        """Return list of booleans telling whether ``paths`` exist."""
+        return cls._dispatch_many('exists_many', paths)
+
+    @classmethod
+    def checksum_many(cls, paths, algorithm='sha256'):
+        """Return list of hexadecimal digests of files at ``paths``, in order.
+
+        Each session computes digests of its paths in a batch. Items of
+        files that cannot be read are :class:`OSError` instances.
+
+        """
+        return cls._dispatch_many('checksum_many', paths, algorithm=algorithm)
+
+    @classmethod
+    def _dispatch_many(cls, method_name, paths, **kwargs):
+        """Call session's ``path.<method_name>()`` once per session, return
+        results in the order of ``paths``.
+
+        ``kwargs`` are passed to each call.
+
+        """
+        paths = list(paths)
+        groups = {}  # Session id => (session, indexes).
+        for index, path in enumerate(paths):
+            session = path.xal_session
+            if session is None:
+                raise ValueError(
+                    "{path!r} is not attached to a session.".format(
+                        path=path))
+            groups.setdefault(id(session), (session, []))[1].append(index)
+        results = [None] * len(paths)
+        for session, indexes in groups.values():
+            method = getattr(session.path, method_name)
+            group_results = method([paths[index] for index in indexes],
+                                   **kwargs)
+            for index, result in zip(indexes, group_results):
+                results[index] = result
+        return results
+
     def chmod(self, mode):
         return self.xal_session.path.chmod(self, mode)
 
     def exists(self):
         return self.xal_session.path.exists(self)
 
-    def glob(self, pattern):
-        return self.xal_session.path.glob(self, pattern)
+    def glob(self, pattern, limit=None):
+        return self.xal_session.path.glob(self, pattern, limit=limit)
 
     def group(self):
         return self.xal_session.path.group(self)
@@ -221,6 +278,13 @@ class Path(Resource):
     def iterdir(self):
         return self.xal_session.path.iterdir(self)
 
+    def scandir(self, stat=False):
+        return self.xal_session.path.scandir(self, stat=stat)
+
+    def walk(self, workers=None, onerror=None):
+        return self.xal_session.path.walk(self, workers=workers,
+                                          onerror=onerror)
+
     def lchmod(self, mode):
         return self.xal_session.path.lchmod(self, mode)
 
@@ -259,8 +323,8 @@ class Path(Resource):
     def resolve(self):
         return self.xal_session.path.resolve(self)
 
-    def rglob(self, pattern):
-        return self.xal_session.path.rglob(self, pattern)
+    def rglob(self, pattern, limit=None):
+        return self.xal_session.path.rglob(self, pattern, limit=limit)
 
     def rmdir(self):
         return self.xal_session.path.rmdir(self)
@@ -279,3 +343,44 @@ class Path(Resource):
 
     def unlink(self):
         return self.xal_session.path.unlink(self)
+
+    def utime(self, times=None):
+        return self.xal_session.path.utime(self, times)
+
+    def read_bytes(self):
+        return self.xal_session.path.read_bytes(self)
+
+    def iter_chunks(self, size=transfer.CHUNK_SIZE):
+        """Yield file's content in chunks of at most ``size`` bytes.
+
+        Chunks are :class:`memoryview` instances of one reused buffer: each
+        one is valid until next iteration. See
+        :meth:`xal.path.provider.PathProvider.iter_chunks`.
+
+        """
+        return self.xal_session.path.iter_chunks(self, size)
+
+    def mmap(self):
+        """Return file's content mapped in memory, read-only. Local sessions
+        only."""
+        return self.xal_session.path.mmap(self)
+
+    def checksum(self, algorithm='sha256'):
+        """Return hexadecimal digest of file's content, computed in its
+        session: remote files are not downloaded."""
+        return self.xal_session.path.checksum(self, algorithm)
+
+    def copy_to(self, target):
+        """Copy file or directory to ``target``, in any session.
+
+        ``target`` is a :class:`Path`, possibly of another session, or text
+        (then in the same session). Data streams in bounded chunks,
+        directories through a tar pipe. Mode and modification time are
+        preserved. Return target :class:`Path`.
+
+        See :mod:`xal.path.transfer`.
+
+        """
+        if not isinstance(target, Path):
+            target = self._cast(target)
+        return transfer.copy(self, target)
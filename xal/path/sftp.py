@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""Pipelined SFTP files, as returned by remote sessions' ``open()``.
+
+A plain SFTP file sends a request and waits for its response at each read
+or write: on links with latency, throughput is bounded by request size per
+round trip. Files of this module keep several requests in flight:
+
+* sequential reads are prefetched ahead, in a window which grows while
+  reads stay sequential, up to ``read_ahead`` bytes;
+
+* small writes are coalesced in a buffer, then sent as requests which are
+  not waited for, up to ``write_behind`` bytes in flight.
+
+Requests go through paramiko's SFTP client, as its own files' prefetching
+does. Errors of pipelined writes are raised by a later operation:
+``write()``, ``flush()``, ``seek()``, ``read()`` or ``close()``.
+
+"""
+import collections
+import io
+import os
+
+from paramiko.py3compat import long
+from paramiko.sftp import CMD_DATA, CMD_READ, CMD_STATUS, CMD_WRITE
+
+
+#: Size of SFTP requests, in bytes. 32 KiB is accepted by all servers.
+REQUEST_SIZE = 32 * 1024
+
+#: Default maximum size of reads in flight, in bytes.
+READ_AHEAD = 1024 * 1024
+
+#: Default maximum size of writes in flight, in bytes.
+WRITE_BEHIND = 1024 * 1024
+
+
+class SFTPFile(io.BufferedIOBase):
+    """Binary file object over an opened paramiko's ``SFTPFile``.
+
+    ``read_ahead`` and ``write_behind`` are sizes of windows, in bytes. Zero
+    means one request at a time. Writes are sent once ``buffer_size`` bytes
+    (defaults to ``request_size``) are buffered.
+
+    """
+    def __init__(self, sftp_file, mode='r', name=None,
+                 request_size=REQUEST_SIZE, read_ahead=READ_AHEAD,
+                 write_behind=WRITE_BEHIND, buffer_size=None):
+        super(SFTPFile, self).__init__()
+        #: Wrapped paramiko's file, owning the SFTP handle.
+        self.raw = sftp_file
+        #: Mode file was opened with.
+        self.mode = mode
+        #: Path of file.
+        self.name = name
+        self.request_size = request_size
+        self.read_ahead = read_ahead
+        self.write_behind = write_behind
+        self.buffer_size = buffer_size or request_size
+        self._sftp = sftp_file.sftp
+        self._handle = sftp_file.handle
+        self._readable = 'r' in mode or '+' in mode
+        self._writable = set(mode) & set('wax+') != set()
+        #: Position of file, as seen by user.
+        self._position = 0
+        if 'a' in mode:
+            self._position = sftp_file.stat().st_size
+        #: Read data, starting at position.
+        self._read_buffer = bytearray()
+        #: Read requests in flight: ``(number, offset, length)``.
+        self._reads = collections.deque()
+        #: Offset of next read request.
+        self._fetch_offset = 0
+        #: Size of read window: it grows while reads are sequential.
+        self._window = 0
+        #: Offset of end of file, once a read reached it.
+        self._eof = None
+        #: Written data not sent yet, ending at position.
+        self._write_buffer = bytearray()
+        #: Write requests in flight: ``(number, length)``.
+        self._writes = collections.deque()
+        #: Responses received, by request number: data (bytes), ``None`` for
+        #: successful status, or exception.
+        self._responses = {}
+        #: Numbers of requests whose responses are not waited for anymore.
+        self._abandoned = set()
+
+    def readable(self):
+        return self._readable
+
+    def writable(self):
+        return self._writable
+
+    def seekable(self):
+        return True
+
+    def _async_response(self, type, message, number):
+        """Store response to request ``number``: called by paramiko's SFTP
+        client as it dispatches packets."""
+        if number in self._abandoned:
+            self._abandoned.discard(number)
+            return
+        if type == CMD_DATA:
+            self._responses[number] = message.get_string()
+        elif type == CMD_STATUS:
+            try:
+                self._sftp._convert_status(message)
+            except EOFError:
+                self._responses[number] = b''
+            except (IOError, OSError) as exception:
+                self._responses[number] = exception
+            else:
+                self._responses[number] = None
+        else:
+            self._responses[number] = IOError(
+                'Unexpected SFTP response type {type}'.format(type=type))
+
+    def _wait(self, number):
+        """Return response to request ``number``, receiving packets until it
+        arrives. Raise errors."""
+        while number not in self._responses:
+            self._sftp._read_response()
+        response = self._responses.pop(number)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def _request(self, type, *args):
+        return self._sftp._async_request(self, type, self._handle, *args)
+
+    # Reads.
+
+    def _drop_reads(self):
+        """Forget read data and read requests in flight."""
+        for number, offset, length in self._reads:
+            if number in self._responses:
+                del self._responses[number]
+            else:
+                self._abandoned.add(number)
+        self._reads.clear()
+        self._read_buffer = bytearray()
+        self._fetch_offset = self._position
+        self._window = 0
+
+    def _fetch(self):
+        """Send read requests until window is full: ``_window`` bytes in
+        flight, at least one request."""
+        if not self._read_buffer and not self._reads:
+            # Position may have moved since last read: writes, seeks.
+            self._fetch_offset = self._position
+        window = max(self._window, self.request_size)
+        end = self._position + len(self._read_buffer) + window
+        while self._fetch_offset < end:
+            if self._eof is not None and self._fetch_offset >= self._eof:
+                return
+            length = self.request_size
+            number = self._request(CMD_READ, long(self._fetch_offset),
+                                   int(length))
+            self._reads.append((number, self._fetch_offset, length))
+            self._fetch_offset += length
+
+    def _fill(self):
+        """Receive next block of data into read buffer. Return False at end
+        of file."""
+        if self._eof is not None \
+                and self._position + len(self._read_buffer) >= self._eof:
+            return False
+        self._fetch()
+        number, offset, length = self._reads.popleft()
+        try:
+            data = self._wait(number)
+        except Exception:
+            self._drop_reads()
+            raise
+        self._read_buffer.extend(data)
+        if len(data) < length:  # End of file, or short read.
+            if not data:
+                self._eof = offset
+            self._drop_reads_after(offset + len(data))
+            return bool(data)
+        # Sequential reads: grow window, up to read_ahead.
+        self._window = min(max(self._window * 2, self.request_size * 2),
+                           self.read_ahead)
+        return True
+
+    def _drop_reads_after(self, offset):
+        """Forget read requests in flight, fetch again from ``offset``."""
+        buffer = self._read_buffer
+        self._drop_reads()
+        self._read_buffer = buffer
+        self._fetch_offset = offset
+
+    def _prepare_read(self):
+        if not self._readable:
+            raise io.UnsupportedOperation('File not open for reading.')
+        if self._write_buffer or self._writes:
+            self.flush()
+
+    def read(self, size=-1):
+        self._prepare_read()
+        if size is None or size < 0:
+            while self._fill():
+                pass
+            size = len(self._read_buffer)
+        else:
+            while len(self._read_buffer) < size and self._fill():
+                pass
+        data = bytes(self._read_buffer[:size])
+        del self._read_buffer[:size]
+        self._position += len(data)
+        return data
+
+    def read1(self, size=-1):
+        """Read at most ``size`` bytes, receiving at most one block."""
+        self._prepare_read()
+        if not self._read_buffer:
+            self._fill()
+        if size is None or size < 0:
+            size = len(self._read_buffer)
+        data = bytes(self._read_buffer[:size])
+        del self._read_buffer[:size]
+        self._position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        view = memoryview(buffer)
+        self._prepare_read()
+        size = len(view)
+        while len(self._read_buffer) < size and self._fill():
+            pass
+        length = min(size, len(self._read_buffer))
+        view[:length] = self._read_buffer[:length]
+        del self._read_buffer[:length]
+        self._position += length
+        return length
+
+    def peek(self, size=0):
+        """Return buffered data, without moving position. Receive one block
+        if buffer is empty."""
+        self._prepare_read()
+        if not self._read_buffer:
+            self._fill()
+        return bytes(self._read_buffer)
+
+    # Writes.
+
+    def _send(self, size):
+        """Send ``size`` bytes from start of write buffer, in pipelined
+        requests."""
+        offset = self._position - len(self._write_buffer)
+        sent = 0
+        while sent < size:
+            length = min(self.request_size, size - sent)
+            data = bytes(self._write_buffer[sent:sent + length])
+            number = self._request(CMD_WRITE, long(offset + sent), data)
+            self._writes.append((number, length))
+            sent += length
+            in_flight = sum(length for number, length in self._writes)
+            while self._writes and in_flight > self.write_behind:
+                number, length = self._writes.popleft()
+                in_flight -= length
+                try:
+                    self._wait(number)
+                except Exception:
+                    del self._write_buffer[:sent]
+                    raise
+        del self._write_buffer[:size]
+
+    def write(self, data):
+        if not self._writable:
+            raise io.UnsupportedOperation('File not open for writing.')
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+        if self._reads or self._read_buffer:
+            self._drop_reads()
+        self._eof = None  # File may grow.
+        self._write_buffer += data
+        self._position += len(data)
+        if len(self._write_buffer) >= self.buffer_size:
+            self._send(len(self._write_buffer))
+        return len(data)
+
+    def flush(self):
+        """Send buffered data, wait for all writes in flight."""
+        if self.closed:
+            return
+        if self._write_buffer:
+            self._send(len(self._write_buffer))
+        while self._writes:
+            number, length = self._writes.popleft()
+            self._wait(number)
+
+    # Position.
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            self.flush()
+            offset += self.raw.stat().st_size
+        elif whence != os.SEEK_SET:
+            raise ValueError('Invalid whence {whence!r}'.format(whence=whence))
+        if offset < 0:
+            raise ValueError('Negative seek position {offset}'.format(
+                offset=offset))
+        self.flush()
+        delta = offset - self._position
+        if 0 <= delta <= len(self._read_buffer):  # Skip read data.
+            del self._read_buffer[:delta]
+            self._position = offset
+        else:
+            self._position = offset
+            self._drop_reads()
+            self._eof = None
+        return self._position
+
+    def truncate(self, size=None):
+        self.flush()
+        if size is None:
+            size = self._position
+        self.raw.truncate(size)
+        self._drop_reads()
+        self._eof = None
+        return size
+
+    def close(self):
+        """Send buffered data, wait for writes in flight, close handle."""
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            # Do not send nor wait anything more, even if flush failed.
+            self._write_buffer = bytearray()
+            for number, length in self._writes:
+                self._abandoned.add(number)
+            self._writes.clear()
+            self._drop_reads()
+            super(SFTPFile, self).close()
+            self.raw.close()
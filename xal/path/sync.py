@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""Synchronize trees between sessions, as rsync does.
+
+Files of source tree are compared with the ones of target tree on size and
+modification time, or on content checksums. Only new and changed files are
+transferred. Large changed files of local trees synchronized to remote ones
+are patched with rolling-checksum block deltas (see :mod:`xal.path.delta`):
+only blocks which changed are sent.
+
+Works with any pair of sessions, through path interface.
+
+"""
+import stat
+
+from xal.path import delta, transfer
+
+
+#: Files smaller than this size, in bytes, are copied as a whole.
+DELTA_THRESHOLD = 1024 * 1024
+
+
+class SyncReport(object):
+    """What :func:`sync` did, or would do in dry-run mode.
+
+    Items of lists are paths relative to synchronized trees, as text.
+
+    """
+    def __init__(self, dry_run=False):
+        #: Whether nothing was actually changed.
+        self.dry_run = dry_run
+        #: Directories created in target.
+        self.created = []
+        #: Files copied as a whole, because they were new or small.
+        self.copied = []
+        #: Files patched with block deltas.
+        self.patched = []
+        #: Files and directories deleted from target.
+        self.deleted = []
+        #: Files which did not change.
+        self.unchanged = []
+        #: Number of bytes of file data sent to target: whole files, or data
+        #: not found in former files. Zero in dry-run mode.
+        self.sent = 0
+
+    def __repr__(self):
+        return '<{cls}: {created} created, {copied} copied, ' \
+               '{patched} patched, {deleted} deleted, ' \
+               '{unchanged} unchanged>'.format(
+                   cls=self.__class__.__name__,
+                   created=len(self.created),
+                   copied=len(self.copied),
+                   patched=len(self.patched),
+                   deleted=len(self.deleted),
+                   unchanged=len(self.unchanged))
+
+    @property
+    def changed(self):
+        """Whether target was (or would be) altered."""
+        return bool(self.created or self.copied or self.patched
+                    or self.deleted)
+
+
+def list_tree(root):
+    """Return ``(directories, files)`` sets of paths relative to ``root``.
+
+    Symlinks to directories are not walked, so they are skipped.
+
+    """
+    directories = set()
+    files = set()
+    for directory, subdirs, names in root.walk():
+        relative = str(directory.relative_to(root))
+        prefix = '' if relative == '.' else relative + '/'
+        if prefix:
+            directories.add(relative)
+        files.update(prefix + name for name in names)
+    return directories, files
+
+
+def child(root, relative):
+    """Return path at ``relative`` path (text) under ``root``."""
+    return root / root.xal_session.path(relative)
+
+
+def differ(source_stat, target_stat):
+    """Return whether files differ, according to size and modification
+    time (in whole seconds, as remote sessions report them)."""
+    return source_stat.st_size != target_stat.st_size \
+        or int(source_stat.st_mtime) != int(target_stat.st_mtime)
+
+
+def use_deltas(source, target):
+    """Return whether block deltas may save transfers from ``source`` to
+    ``target`` paths.
+
+    Blocks are matched in source session, in pure Python: that is much
+    slower than a local copy, and a remote source would be downloaded as a
+    whole to be matched. So only local sources patch remote targets.
+
+    """
+    return source.xal_session.is_local and not target.xal_session.is_local
+
+
+def sync(source, target, delete=False, checksum=False, dry_run=False,
+         delta_threshold=DELTA_THRESHOLD):
+    """Make ``target`` tree a copy of ``source`` tree, return
+    :class:`SyncReport`.
+
+    ``source`` and ``target`` are paths, possibly of different sessions.
+    ``source`` may be a file.
+
+    Files are compared on size and modification time. If ``checksum`` is
+    true, files of the same size are compared on content checksums instead,
+    computed in their sessions.
+
+    Changed files of at least ``delta_threshold`` bytes are patched with
+    block deltas if ``source`` is local and ``target`` is remote (remote
+    host needs Python), see :func:`use_deltas`. Others are copied. Mode and
+    modification time are applied.
+
+    If ``delete`` is true, files and directories of target which are not in
+    source are deleted. If ``dry_run`` is true, nothing is changed: report
+    tells what would be done.
+
+    """
+    report = SyncReport(dry_run=dry_run)
+    if not source.is_dir():
+        sync_files(source, target, ['.'], checksum, dry_run,
+                   delta_threshold, report)
+        return report
+    source_directories, source_files = list_tree(source)
+    if target.is_dir():
+        target_directories, target_files = list_tree(target)
+    elif target.exists():  # File replaced by a directory.
+        report.deleted.append('.')
+        if not dry_run:
+            target.unlink()
+        target_directories, target_files = set(), set()
+    else:
+        report.created.append('.')
+        if not dry_run:
+            target.mkdir(parents=True)
+        target_directories, target_files = set(), set()
+    # Clear type conflicts: directories replaced by files and vice versa.
+    for relative in sorted(target_directories & source_files):
+        report.deleted.append(relative)
+        if not dry_run:
+            target.xal_session.path.rm(child(target, relative))
+        target_directories = set(
+            item for item in target_directories
+            if item != relative and not item.startswith(relative + '/'))
+        target_files = set(
+            item for item in target_files
+            if not item.startswith(relative + '/'))
+    for relative in sorted(target_files & source_directories):
+        report.deleted.append(relative)
+        if not dry_run:
+            child(target, relative).unlink()
+        target_files.discard(relative)
+    # Create directories, parents first.
+    for relative in sorted(source_directories - target_directories):
+        report.created.append(relative)
+        if not dry_run:
+            child(target, relative).mkdir(parents=True)
+    sync_files(source, target, sorted(source_files), checksum, dry_run,
+               delta_threshold, report, existing=target_files)
+    if delete:
+        for relative in sorted(target_files - source_files):
+            report.deleted.append(relative)
+            if not dry_run:
+                child(target, relative).unlink()
+        removed = []
+        for relative in sorted(target_directories - source_directories):
+            if any(relative.startswith(parent + '/') for parent in removed):
+                continue  # Already removed with its parent.
+            removed.append(relative)
+            report.deleted.append(relative)
+            if not dry_run:
+                target.xal_session.path.rm(child(target, relative))
+    return report
+
+
+def sync_files(source, target, files, checksum, dry_run, delta_threshold,
+               report, existing=None):
+    """Synchronize ``files`` (relative paths) of ``source`` to ``target``.
+
+    ``existing`` is the set of files known in ``target``, if it was listed.
+    Metadata of files are gathered in batches, with ``stat_many()`` and
+    ``checksum_many()``.
+
+    """
+    deltas = use_deltas(source, target)
+    source_paths = [child(source, relative) for relative in files]
+    target_paths = [child(target, relative) for relative in files]
+    source_stats = source.xal_session.path.stat_many(source_paths)
+    target_stats = target.xal_session.path.stat_many(target_paths)
+    candidates = []  # Indexes of files of same size, to compare content.
+    changed = []
+    for index, relative in enumerate(files):
+        source_stat = source_stats[index]
+        target_stat = target_stats[index]
+        if isinstance(source_stat, OSError):  # Vanished, or broken link.
+            continue
+        if isinstance(target_stat, OSError) \
+                or (existing is not None and relative not in existing):
+            changed.append(index)
+        elif checksum:
+            if source_stat.st_size != target_stat.st_size:
+                changed.append(index)
+            else:
+                candidates.append(index)
+        elif differ(source_stat, target_stat):
+            changed.append(index)
+        else:
+            report.unchanged.append(relative)
+    if candidates:
+        source_sums = source.xal_session.path.checksum_many(
+            [source_paths[index] for index in candidates])
+        target_sums = target.xal_session.path.checksum_many(
+            [target_paths[index] for index in candidates])
+        for index, source_sum, target_sum in zip(candidates, source_sums,
+                                                 target_sums):
+            if source_sum == target_sum:
+                report.unchanged.append(files[index])
+            else:
+                changed.append(index)
+    for index in sorted(changed):
+        relative = files[index]
+        source_stat = source_stats[index]
+        target_stat = target_stats[index]
+        use_delta = deltas \
+            and not isinstance(target_stat, OSError) \
+            and stat.S_ISREG(target_stat.st_mode) \
+            and min(source_stat.st_size, target_stat.st_size) \
+            >= delta_threshold
+        if use_delta:
+            if dry_run:
+                report.patched.append(relative)
+                continue
+            try:
+                report.sent += patch_file(source_paths[index],
+                                          target_paths[index])
+            except NotImplementedError:  # No delta support in target.
+                pass
+            else:
+                report.patched.append(relative)
+                apply_metadata(target_paths[index], source_stat)
+                continue
+        report.copied.append(relative)
+        if not dry_run:
+            transfer.copy_file(source_paths[index], target_paths[index])
+            report.sent += source_stat.st_size
+
+
+def patch_file(source, target):
+    """Patch ``target`` file with block deltas from ``source``, return
+    number of bytes of data sent."""
+    signatures = target.xal_session.path.block_signatures(target)
+    counter = {'sent': 0}
+
+    def instructions(source_file):
+        for kind, value in delta.delta(source_file, signatures):
+            if kind == 'data':
+                counter['sent'] += len(value)
+            yield kind, value
+
+    with source.open('rb') as source_file:
+        target.xal_session.path.patch(target, instructions(source_file))
+    return counter['sent']
+
+
+def apply_metadata(target, source_stat):
+    """Apply mode and times of ``source_stat`` to ``target``."""
+    target.chmod(stat.S_IMODE(source_stat.st_mode))
+    target.utime((source_stat.st_atime, source_stat.st_mtime))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Copy files and directories between sessions.
+
+Data streams from one session to the other, in bounded chunks: it is never
+held in memory as a whole. Mode and modification time are preserved.
+
+"""
+import pipes
+import stat
+
+
+#: Size of chunks read from source, in bytes.
+CHUNK_SIZE = 1024 * 1024
+
+
+def copy(source, target, chunk_size=CHUNK_SIZE):
+    """Copy ``source`` path to ``target`` path, which may belong to
+    different sessions. Return ``target``.
+
+    Directories are copied recursively, through :func:`copy_tree`. Files
+    with :func:`copy_file`.
+
+    """
+    if source.is_dir():
+        copy_tree(source, target)
+    else:
+        copy_file(source, target, chunk_size=chunk_size)
+    return target
+
+
+def copy_file(source, target, chunk_size=CHUNK_SIZE):
+    """Copy file ``source`` to ``target``, chunk by chunk.
+
+    Files are opened with sessions' ``open()``: local files, or SFTP files
+    in remote sessions. Mode and access/modification times are then applied
+    to ``target``.
+
+    """
+    source_stat = source.stat()
+    with source.open('rb') as source_file:
+        with target.open('wb') as target_file:
+            while True:
+                data = source_file.read(chunk_size)
+                if not data:
+                    break
+                target_file.write(data)
+    target.chmod(stat.S_IMODE(source_stat.st_mode))
+    target.utime((source_stat.st_atime, source_stat.st_mtime))
+
+
+def copy_tree(source, target):
+    """Copy directory ``source`` to ``target`` through a tar pipe.
+
+    ``tar`` archives ``source`` in its session, ``tar`` extracts it in
+    ``target``'s session, which is created if needed. Archive streams from
+    one command to the other. Modes and modification times are kept.
+
+    Raise :class:`OSError` if either command fails.
+
+    """
+    archive = source.xal_session.sh.stream(
+        'tar -cf - -C {path} .'.format(
+            path=pipes.quote(str(source.resolve()))))
+    chunks = archive.iter_chunks()
+    try:
+        extract = target.xal_session.sh(
+            'mkdir -p {path} && tar -xpf - -C {path}'.format(
+                path=pipes.quote(str(target.resolve()))),
+            stdin=chunks)
+        result = target.xal_session.sh.run(extract)
+    finally:
+        if not archive.done:
+            archive.kill()
+            archive.wait()
+    for command_result in (archive, result):
+        if not command_result.succeeded:
+            raise OSError(
+                'Cannot copy {source!r} to {target!r}: {error}'.format(
+                    source=source,
+                    target=target,
+                    error=command_result.decode(name='stderr').strip()))
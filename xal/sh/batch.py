@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Run several commands in a single sh script, with framed output."""
+import uuid
+
+from xal.sh.resource import ShResult
+
+
+class ShBatch(object):
+    """Script running several commands, whose outputs can be told apart.
+
+    Each command runs in a subshell, so that ``exit`` or ``cd`` do not affect
+    next commands. Its output is framed by markers, written on both stdout
+    and stderr. Return code follows the end marker on stdout.
+
+    If ``stop_on_error`` is true, script exits after the first command which
+    fails: next commands do not run.
+
+    """
+    def __init__(self, commands, stop_on_error=False):
+        #: List of commands.
+        self.commands = list(commands)
+        #: Whether script stops after the first command which fails.
+        self.stop_on_error = stop_on_error
+        #: Random token, so that markers do not collide with output.
+        self.token = uuid.uuid4().hex
+
+    def marker(self, index):
+        """Return marker framing output of command at ``index``."""
+        return 'xal-batch-{token}-{index}'.format(token=self.token,
+                                                  index=index)
+
+    def __str__(self):
+        lines = []
+        for index, command in enumerate(self.commands):
+            marker = self.marker(index)
+            lines.append("printf '%s\\n' {marker}; "
+                         "printf '%s\\n' {marker} >&2".format(marker=marker))
+            lines.append('(\n{command}\n) </dev/null; xal_status=$?'
+                         .format(command=command))
+            lines.append("printf '\\n%s %d\\n' {marker} $xal_status; "
+                         "printf '\\n%s\\n' {marker} >&2"
+                         .format(marker=marker))
+            if self.stop_on_error:
+                lines.append('[ $xal_status -eq 0 ] || exit $xal_status')
+        return '\n'.join(lines)
+
+    def parse(self, stdout, stderr):
+        """Return list of :class:`~xal.sh.resource.ShResult`, one per command.
+
+        If the script was interrupted, or stopped on error, results of
+        commands whose output is missing have an ``error``.
+
+        """
+        results = []
+        stdout_position = stderr_position = 0
+        for index, command in enumerate(self.commands):
+            result = ShResult()
+            try:
+                result.stdout, stdout_position, return_code = self.frame(
+                    stdout, index, stdout_position)
+                result.stderr, stderr_position, _ = self.frame(
+                    stderr, index, stderr_position)
+                result.return_code = int(return_code)
+            except ValueError:
+                result.error = ValueError(
+                    'Output of command {index} is missing: batch was '
+                    'interrupted.'.format(index=index))
+            results.append(result)
+        return results
+
+    def frame(self, output, index, position=0):
+        """Return output of command at ``index``, searching from position.
+
+        Return a tuple ``(data, next_position, suffix)`` where ``suffix`` is
+        text following the end marker on its line. ``data`` is a
+        :class:`memoryview` slice of ``output``: output of commands is not
+        copied until read.
+
+        Raise ValueError if frame is not found.
+
+        """
+        marker = self.marker(index)
+        begin = marker + '\n'
+        start = output.index(begin, position) + len(begin)
+        end = output.index('\n' + marker, start)
+        suffix_start = end + 1 + len(marker)
+        suffix_end = output.index('\n', suffix_start)
+        return (memoryview(output)[start:end],
+                suffix_end + 1,
+                output[suffix_start:suffix_end].strip())
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Cache of results of idempotent commands.
+
+Assign an instance to ``session.sh.cache``. Results of commands marked
+``cacheable`` are then reused, until they expire.
+
+"""
+import collections
+import time
+
+from xal.sh.resource import ShResult
+
+
+class ShResultCache(object):
+    """Keep results for ``ttl`` seconds, at most ``max_size`` of them.
+
+    Least recently used results are evicted first. ``ttl=None`` means results
+    never expire.
+
+    Return code and output are stored, not results: every hit returns a new
+    :class:`~xal.sh.resource.ShResult`, which callers are free to alter.
+
+    """
+    def __init__(self, ttl=60, max_size=256):
+        #: Delay, in seconds, after which results expire.
+        self.ttl = ttl
+        #: Maximum number of results kept.
+        self.max_size = max_size
+        #: Number of lookups which returned a result.
+        self.hits = 0
+        #: Number of lookups which did not.
+        self.misses = 0
+        #: Mapping of keys to
+        #: ``(expiry, return_code, return_codes, stdout, stderr)``,
+        #: least recently used first.
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return result stored for ``key``, or ``None``."""
+        entry = self._entries.pop(key, None)
+        if entry is None or (entry[0] is not None
+                             and entry[0] <= time.time()):
+            self.misses += 1
+            return None
+        self._entries[key] = entry  # Most recently used.
+        self.hits += 1
+        expiry, return_code, return_codes, stdout, stderr = entry
+        result = ShResult()
+        result.return_code = return_code
+        if return_codes is not None:
+            result.return_codes = list(return_codes)
+        result.stdout = stdout
+        result.stderr = stderr
+        return result
+
+    def set(self, key, result):
+        """Store complete ``result`` for ``key``."""
+        expiry = None if self.ttl is None else time.time() + self.ttl
+        self._entries.pop(key, None)
+        self._entries[key] = (expiry, result.return_code, result.return_codes,
+                              result.stdout, result.stderr)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forget all results. Counters are kept."""
+        self._entries.clear()
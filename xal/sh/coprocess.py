@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Long-lived shell, running commands sent on its stdin."""
+import re
+
+from xal.sh.batch import ShBatch
+
+
+class ShellExited(Exception):
+    """Long-lived shell exited unexpectedly."""
+
+
+class ShCoprocess(object):
+    """Long-lived shell, running commands sent on its stdin.
+
+    Commands are sent one at a time, as a :class:`~xal.sh.batch.ShBatch`:
+    they run in subshells, their output is framed by markers.
+
+    """
+    def __init__(self, process, write):
+        #: Shell process, as ``process`` of :class:`~xal.sh.resource.ShResult`.
+        self.process = process
+        #: Callable sending text to shell's stdin.
+        self.write = write
+
+    @property
+    def closed(self):
+        """Whether shell exited."""
+        return self.process.closed
+
+    def run(self, command):
+        """Run ``command`` in shell, return :class:`ShResult`."""
+        batch = ShBatch([command])
+        marker = re.escape(batch.marker(0))
+        ends = {
+            'stdout': re.compile(r'\n{marker} -?\d+\n$'.format(marker=marker)),
+            'stderr': re.compile(r'\n{marker}\n$'.format(marker=marker)),
+        }
+        # Frames are complete when output ends with end markers: shell
+        # writes nothing else until it receives next command.
+        tail_size = len(marker) + 32
+        chunks = {'stdout': [], 'stderr': []}
+        tails = {'stdout': '', 'stderr': ''}
+        pending = set(chunks)
+        self.write(str(batch) + '\n')
+        while pending:
+            if self.process.closed:
+                raise ShellExited()
+            for name, data in self.process.read():
+                chunks[name].append(data)
+                tails[name] = (tails[name] + data)[-tail_size:]
+                if ends[name].search(tails[name]):
+                    pending.discard(name)
+        return batch.parse(''.join(chunks['stdout']),
+                           ''.join(chunks['stderr']))[0]
+
+    def close(self):
+        """Terminate shell."""
+        if not self.process.closed:
+            self.write('exit\n')
+            while not self.process.closed:
+                self.process.read()
+        self.process.wait()
@@ -1,43 +1,269 @@
 """Implementation of SH using Fabric."""
 from __future__ import absolute_import, print_function
+import pipes
+import select
+import socket
 
-import fabric.api
+import fabric.operations
+import fabric.state
+import paramiko
 
+from xal.sh.batch import ShBatch
+from xal.path.resource import Path
+from xal.sh.coprocess import ShCoprocess
+from xal.sh.input import iter_input
 from xal.sh.provider import ShProvider
-from xal.sh.resource import ShCommand, ShResult
+from xal.sh.resource import ShCommand, ShPipe, ShResult
+
+
+class FabricShProcess(object):
+    """Running remote command, attached to a SSH channel."""
+    #: Maximum size of chunks received from channel.
+    chunk_size = 64 * 1024
+
+    #: Maximum delay, in seconds, between attempts to feed input. Channel
+    #: does not become readable when remote side is ready to receive data.
+    feed_interval = 0.1
+
+    #: Prefix of the line :attr:`pgid_command` writes.
+    pgid_prefix = 'xal-pgid '
+
+    #: Shell command writing remote process group ID as first line of
+    #: stderr, so that :meth:`kill` can kill the whole remote process tree.
+    pgid_command = 'printf "{prefix}%s\\n" "$(ps -o pgid= -p $$)" >&2' \
+                   .format(prefix=pgid_prefix)
+
+    def __init__(self, channel, input=None, pgid_header=False, stages=1):
+        #: Paramiko channel the command runs in.
+        self.channel = channel
+        #: Number of piped commands. Remote shell only reports return code
+        #: of the last one.
+        self.stages = stages
+        #: Iterator over chunks of data to send as stdin, if any.
+        self.input = input
+        #: Data of current chunk not sent yet.
+        self._pending = ''
+        #: Remote process group ID, once known.
+        self.pgid = None
+        #: Beginning of stderr, until :attr:`pgid_command` line is complete.
+        #: ``None`` if there is no such line to expect.
+        self._header = '' if pgid_header else None
+
+    def feed(self):
+        """Send input as long as remote window allows. Then send EOF."""
+        try:
+            while self.input is not None and self.channel.send_ready():
+                if not self._pending:
+                    self._pending = next(self.input, None)
+                    if self._pending is None:
+                        self.channel.shutdown_write()
+                        self.input = None
+                        return
+                sent = self.channel.send(self._pending)
+                self._pending = self._pending[sent:]
+        except socket.error:  # Channel closed, command stopped reading.
+            self.input = None
+            self._pending = ''
+
+    def filenos(self):
+        """Return list with channel's file descriptor."""
+        return [self.channel.fileno()]
+
+    @property
+    def closed(self):
+        """Whether all output has been read."""
+        return self.channel.exit_status_ready() \
+            and not self.channel.recv_ready() \
+            and not self.channel.recv_stderr_ready()
+
+    def read(self, timeout=None):
+        """Return list of ``(name, data)`` chunks available within timeout."""
+        if self.input is not None:
+            self.feed()
+            if self.input is not None and (
+                    timeout is None or timeout > self.feed_interval):
+                timeout = self.feed_interval
+        if not (self.channel.recv_ready() or self.channel.recv_stderr_ready()):
+            select.select([self.channel], [], [], timeout)
+        chunks = []
+        while self.channel.recv_ready():
+            chunks.append(('stdout', self.channel.recv(self.chunk_size)))
+        while self.channel.recv_stderr_ready():
+            data = self.channel.recv_stderr(self.chunk_size)
+            if self._header is not None:
+                data = self._read_header(data)
+            if data:
+                chunks.append(('stderr', data))
+        if self._header and self.closed:  # Incomplete line.
+            chunks.append(('stderr', self._header))
+            self._header = None
+        return chunks
+
+    def _read_header(self, data):
+        """Consume :attr:`pgid_command` line, return remaining stderr."""
+        self._header += data
+        if '\n' not in self._header:
+            return ''
+        line, data = self._header.split('\n', 1)
+        self._header = None
+        if not line.startswith(self.pgid_prefix):  # Command did not run.
+            return line + '\n' + data
+        try:
+            self.pgid = int(line[len(self.pgid_prefix):])
+        except ValueError:  # ps is not available.
+            pass
+        return data
+
+    def wait(self):
+        """Wait for command to terminate and return return codes of stages:
+        ``None`` but for the last one, which remote shell reports."""
+        return_code = self.channel.recv_exit_status()
+        self.channel.close()
+        return [None] * (self.stages - 1) + [return_code]
+
+    def kill(self):
+        """Kill remote process group, if known, and close channel.
+
+        Closing the channel alone does not stop remote processes.
+
+        """
+        if self.pgid is not None:
+            try:
+                channel = fabric.state.default_channel()
+                channel.exec_command(
+                    'kill -KILL -- -{pgid}'.format(pgid=self.pgid))
+                channel.recv_exit_status()
+                channel.close()
+            except (socket.error, paramiko.SSHException):
+                pass
+        self.channel.close()
 
 
 class FabricShProvider(ShProvider):
+    #: Default number of concurrent commands. Each one uses a channel of the
+    #: SSH connection, and OpenSSH allows 10 sessions per connection.
+    max_workers = 10
+
     def make_command_instance(self, command):
         """Return a ShCommand instance related to ``command`` arguments."""
         if isinstance(command, ShCommand):
             return command
         return self.resource_factory(command)
 
+    #: Shell started by :meth:`start_coprocess`, reading commands on stdin.
+    coprocess_shell = '/bin/bash -l'
+
+    def coprocess_command(self, command):
+        """Return text of ``command`` with Fabric's context managers applied.
+
+        As an example, ``cd()`` (which
+        :meth:`xal.path.fabric.FabricPathProvider.cd` relies on) prefixes
+        command with ``cd``. So is environment.
+
+        """
+        return fabric.operations._prefix_env_vars(
+            fabric.operations._prefix_commands(str(command), 'remote'))
+
+    def remote_command(self, command):
+        """Return text of ``command`` as Fabric would run it remotely.
+
+        Honors Fabric's shell and context managers.
+
+        """
+        return fabric.operations._shell_wrap(
+            self.coprocess_command(command),
+            shell_escape=True)
+
+    def start_coprocess(self):
+        """Start remote shell in a new channel, return coprocess."""
+        channel = fabric.state.default_channel()
+        channel.settimeout(None)
+        channel.exec_command(self.coprocess_shell)
+        return ShCoprocess(FabricShProcess(channel), channel.sendall)
+
+    def stream_command_instance(self, command, deadline=None):
+        """Start Command instance in a new channel, return result.
+
+        Paths of the session are redirected to stdin remotely. Other sources
+        of input are sent through the channel.
+
+        Commands with a timeout or a ``deadline`` report their remote
+        process group, killed as a whole when it is over.
+
+        """
+        stdin = command.stdin
+        input = None
+        text = str(command)
+        deadline = self.command_deadline(command, deadline)
+        if isinstance(stdin, Path) and stdin.xal_session is self.xal_session:
+            text = '({command}) < {path}'.format(
+                command=text,
+                path=pipes.quote(str(stdin.resolve())))
+        elif stdin is not None:
+            input = iter_input(stdin)
+        if deadline is not None:
+            text = '{header} && {command}'.format(
+                header=FabricShProcess.pgid_command,
+                command=text)
+        channel = fabric.state.default_channel()
+        channel.exec_command(self.remote_command(text))
+        stages = len(command.stages) if isinstance(command, ShPipe) else 1
+        process = FabricShProcess(channel, input=input,
+                                  pgid_header=deadline is not None,
+                                  stages=stages)
+        return ShResult(process=process,
+                        stdout=command.stdout,
+                        stderr=command.stderr,
+                        deadline=deadline)
+
     def run_command_instance(self, command):
         """Run Command instance."""
-        header = '--- BEGIN xal stdout ---'
-        footer = '--- END xal stdout ---'
-        fabric_command = 'echo -n "{header}"' \
-                         '&& {command}' \
-                         '&& echo -n {footer}' \
-                         .format(header=header,
-                                 command=str(command),
-                                 footer=footer)
-        fabric_result = fabric.api.run(
-            fabric_command,
-            quiet=True,
-            pty=False,  # Avoid issues with newlines.
-        )
-        result = ShResult()
-        result.return_code = fabric_result.return_code
-        result.stdout = fabric_result.stdout[len(header):-len(footer)]
-        result.stderr = fabric_result.stderr[len(header):-len(footer)]
-        return result
+        if self.use_coprocess(command):
+            return self.coprocess.run(self.coprocess_command(command))
+        # Output flows through a channel, whose messages are binary-safe
+        # and length-prefixed, stderr apart: no marker has to be printed nor
+        # searched for.
+        return self.stream_command_instance(command).wait()
+
+    def run_batch(self, commands, stop_on_error=False):
+        """Run ``commands`` in a single remote script: one round trip.
+
+        Commands run one after the other, in subshells. Each one gets its own
+        result, with stdout, stderr and return code. If ``stop_on_error`` is
+        true, script exits after the first command which fails.
+
+        Script has no input, keeps output in memory and has a single
+        deadline (session's default timeout). So commands having ``stdin``,
+        output policies or a ``timeout`` of their own raise
+        :class:`ValueError`.
+
+        """
+        commands = [self.make_command_instance(command)
+                    for command in commands]
+        for command in commands:
+            if command.stdin is not None \
+                    or command.stdout is not None \
+                    or command.stderr is not None \
+                    or command.timeout is not None:
+                raise ValueError(
+                    'Command {command!r} cannot run in a batch: it has '
+                    'stdin, output policies or a timeout.'
+                    .format(command=str(command)))
+        batch = ShBatch(commands, stop_on_error=stop_on_error)
+        result = self.stream(str(batch)).wait()
+        return batch.parse(result.stdout, result.stderr)
+
+    def cache_key(self, command):
+        """Return host and text of ``command`` with Fabric's prefixes, which
+        set working directory and environment."""
+        return (fabric.state.env.host_string, command.shell,
+                self.coprocess_command(command))
 
     def run(self, command):
         """Execute Cmd resource."""
         command = self.make_command_instance(command)
+        if self.use_cache(command):
+            return self.run_cached(command)
         return self.run_command_instance(command)
 
     def supports(self, session):
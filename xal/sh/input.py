@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Sources of data for stdin of commands.
+
+``stdin`` of :class:`~xal.sh.resource.ShCommand` can be:
+
+* text;
+* a file object or a file descriptor;
+* a :class:`~xal.path.resource.Path`, from any session;
+* an iterable of chunks of text, such as a generator.
+
+"""
+import io
+import os
+
+from xal.path.resource import Path
+
+
+def input_fileno(stdin):
+    """Return file descriptor of ``stdin``, or ``None`` if it has none."""
+    if isinstance(stdin, (int, long)):
+        return stdin
+    try:
+        return stdin.fileno()
+    except (AttributeError, IOError, ValueError, io.UnsupportedOperation):
+        return None
+
+
+def read_file(file_obj, chunk_size, close=False):
+    """Yield chunks of data read from ``file_obj``."""
+    try:
+        while True:
+            data = file_obj.read(chunk_size)
+            if not data:
+                break
+            yield data
+    finally:
+        if close:
+            file_obj.close()
+
+
+def read_fd(fd, chunk_size):
+    """Yield chunks of data read from file descriptor."""
+    while True:
+        data = os.read(fd, chunk_size)
+        if not data:
+            break
+        yield data
+
+
+def iter_input(stdin, chunk_size=64 * 1024):
+    """Return iterator over chunks of ``stdin`` data, read lazily."""
+    if isinstance(stdin, basestring):
+        return iter([stdin])
+    if isinstance(stdin, Path):
+        return read_file(stdin.open('rb'), chunk_size, close=True)
+    if isinstance(stdin, (int, long)):
+        return read_fd(stdin, chunk_size)
+    if hasattr(stdin, 'read'):
+        return read_file(stdin, chunk_size)
+    return iter(stdin)
@@ -1,37 +1,309 @@
 # -*- coding: utf-8 -*-
+import errno
+import fcntl
+import multiprocessing
+import os
+import pipes
+import select
+import signal
 import subprocess
 
+from xal.path.resource import Path
+from xal.sh.coprocess import ShCoprocess
+from xal.sh.input import input_fileno, iter_input
 from xal.sh.provider import ShProvider, CommandNotFound
-from xal.sh.resource import ShCommand, ShResult
+from xal.sh.resource import ShCommand, ShPipe, ShResult
+
+
+def pipe():
+    """Return ``(read, write)`` file descriptors, not inherited by children.
+
+    Descriptors are only inherited where they are explicitly redirected.
+
+    """
+    fds = os.pipe()
+    for fd in fds:
+        flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+        fcntl.fcntl(fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+    return fds
+
+
+def restore_signals():
+    """Restore default handling of SIGPIPE, which Python ignores.
+
+    Meant to run in children before exec, so that stages of pipelines are
+    terminated when next stage stops reading, as they are in shells.
+
+    """
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+
+def join_process_group(pgid):
+    """Return function which moves child process to process group ``pgid``.
+
+    ``0`` means a new group, led by the child. Meant to run in children
+    before exec, as :func:`restore_signals`, which it also calls.
+
+    """
+    def preexec():
+        restore_signals()
+        os.setpgid(0, pgid)
+    return preexec
+
+
+class LocalShProcess(object):
+    """Running local processes, whose output pipes are read concurrently.
+
+    Reading stdout and stderr as data arrives avoids deadlocks when the
+    process fills a pipe buffer, and lets output be streamed.
+
+    """
+    #: Maximum size of chunks read from pipes.
+    chunk_size = 64 * 1024
+
+    def __init__(self, processes, stderr, stdin=None, input=None,
+                 pgid=None):
+        #: :class:`subprocess.Popen` instances, one per stage of pipeline.
+        self.processes = processes
+        #: File descriptor of stderr pipe, shared by all processes.
+        self.stderr = stderr
+        #: Mapping of open output file descriptors to stream names.
+        self.streams = {
+            processes[-1].stdout.fileno(): 'stdout',
+            stderr: 'stderr',
+        }
+        #: File descriptor of pipe feeding first process, if any.
+        self.stdin = stdin
+        #: Iterator over chunks of data to write to :attr:`stdin`.
+        self.input = input
+        #: Data of current chunk not written yet.
+        self._pending = ''
+        #: ID of process group of :attr:`processes`, if they have their own.
+        self.pgid = pgid
+        if stdin is not None:
+            flags = fcntl.fcntl(stdin, fcntl.F_GETFL)
+            fcntl.fcntl(stdin, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+    def filenos(self):
+        """Return list of open output file descriptors, and stdin's."""
+        filenos = list(self.streams)
+        if self.stdin is not None:
+            filenos.append(self.stdin)
+        return filenos
+
+    def feed(self):
+        """Write data to stdin without blocking. Close it once exhausted."""
+        try:
+            if not self._pending:
+                self._pending = next(self.input, None)
+                if self._pending is None:
+                    self.close_stdin()
+                    return
+            written = os.write(self.stdin, self._pending)
+            self._pending = self._pending[written:]
+        except OSError as exception:
+            if exception.errno == errno.EAGAIN:
+                return
+            if exception.errno == errno.EPIPE:  # Process stopped reading.
+                self.close_stdin()
+                return
+            raise
+
+    def close_stdin(self):
+        """Close stdin pipe, i.e. send end of file to process."""
+        if self.stdin is not None:
+            os.close(self.stdin)
+            self.stdin = None
+            self._pending = ''
+
+    @property
+    def closed(self):
+        """Whether all output has been read."""
+        return not self.streams
+
+    def read(self, timeout=None):
+        """Return list of ``(name, data)`` chunks available within timeout."""
+        if not self.streams:
+            return []
+        writers = [] if self.stdin is None else [self.stdin]
+        ready, writable, _ = select.select(list(self.streams), writers, [],
+                                           timeout)
+        if writable:
+            self.feed()
+        chunks = []
+        for fd in ready:
+            data = os.read(fd, self.chunk_size)
+            if data:
+                chunks.append((self.streams[fd], data))
+            else:  # End of file.
+                del self.streams[fd]
+        return chunks
+
+    def wait(self):
+        """Wait for processes to terminate and return their return codes."""
+        self.close_stdin()
+        self.processes[-1].stdout.close()
+        os.close(self.stderr)
+        return [process.wait() for process in self.processes]
+
+    def kill(self):
+        """Kill processes, or the whole process group if they have one."""
+        if self.pgid is not None:
+            try:
+                os.killpg(self.pgid, signal.SIGKILL)
+            except OSError:  # Group already gone.
+                pass
+            return
+        for process in self.processes:
+            try:
+                process.kill()
+            except OSError:  # Already gone.
+                pass
 
 
 class LocalShProvider(ShProvider):
+    @property
+    def max_workers(self):
+        """Default number of concurrent commands: number of CPUs."""
+        return multiprocessing.cpu_count()
+
     def make_command_instance(self, command):
         """Return a ShCommand instance related to ``command`` arguments."""
         if isinstance(command, ShCommand):
             return command
         return self.resource_factory(command)
 
-    def run_command_instance(self, command):
-        """Run Command instance."""
-        is_shell = True
+    def spawn(self, command, stdin, stderr, pgid=None):
+        """Start process for ``command`` (without pipes) and return it.
+
+        Returned process has a ``stdout`` pipe, ``wait()`` and ``kill()``
+        methods. If ``pgid`` is not ``None``, process joins that process
+        group (``0`` means a new group).
+
+        """
+        if command.shell:
+            argv = ['/bin/sh', '-c', command.command]
+        else:
+            argv = [str(argument) for argument in command.arguments]
         try:
-            process = subprocess.Popen(command.command,
-                                       stdin=command.stdin,
-                                       stdout=subprocess.PIPE,
-                                       stderr=subprocess.PIPE,
-                                       shell=is_shell)
+            preexec_fn = restore_signals
+            if pgid is not None:
+                preexec_fn = join_process_group(pgid)
+            return subprocess.Popen(argv,
+                                    stdin=stdin,
+                                    stdout=subprocess.PIPE,
+                                    stderr=stderr,
+                                    preexec_fn=preexec_fn)
         except OSError:
             raise CommandNotFound(command.arguments)
-        result = ShResult()
-        result.return_code = process.wait()
-        result.stdout = process.stdout.read()
-        result.stderr = process.stderr.read()
-        return result
+
+    def stream_command_instance(self, command, deadline=None):
+        """Start Command instance, return result attached to the process.
+
+        Pipes are run as a chain of processes, each stage's stdout feeding
+        next stage's stdin. All stages share stderr.
+
+        Files and local paths are handed over to process as stdin. Other
+        sources of input are written to a pipe as process reads it.
+
+        Commands with a timeout or a ``deadline`` run in a process group of
+        their own, killed as a whole when it is over. Others stay in
+        Python's group, so that they can read from terminal, and receive its
+        signals.
+
+        """
+        if isinstance(command, ShPipe):
+            stages = command.stages
+        else:
+            stages = [command]
+        stdin = command.stdin
+        stdin_file = stdin_write = input = None
+        child_fds = []  # Only children use them.
+        if isinstance(stdin, Path) and stdin.xal_session.is_local:
+            stdin_file = stdin.open('rb')
+            stdin = stdin_file.fileno()
+        elif stdin is not None and input_fileno(stdin) is None:
+            input = iter_input(stdin)
+            stdin, stdin_write = pipe()
+            child_fds.append(stdin)
+        stderr_read, stderr_write = pipe()
+        child_fds.append(stderr_write)
+        deadline = self.command_deadline(command, deadline)
+        pgid = None if deadline is None else 0
+        processes = []
+        try:
+            for stage in stages:
+                process = self.spawn(stage, stdin=stdin, stderr=stderr_write,
+                                     pgid=pgid)
+                if pgid == 0:  # First stage leads the group.
+                    pgid = process.pid
+                if processes:  # Only next stage reads previous' stdout.
+                    processes[-1].stdout.close()
+                processes.append(process)
+                stdin = process.stdout
+        except Exception:
+            os.close(stderr_read)
+            if stdin_write is not None:
+                os.close(stdin_write)
+            for process in processes:
+                process.stdout.close()
+            raise
+        finally:
+            for fd in child_fds:
+                os.close(fd)
+            if stdin_file is not None:
+                stdin_file.close()
+        process = LocalShProcess(processes, stderr_read,
+                                 stdin=stdin_write, input=input, pgid=pgid)
+        return ShResult(process=process,
+                        stdout=command.stdout,
+                        stderr=command.stderr,
+                        deadline=deadline)
+
+    def start_coprocess(self):
+        """Start local ``sh``, return :class:`ShCoprocess`."""
+        stderr_read, stderr_write = pipe()
+        try:
+            process = subprocess.Popen(['/bin/sh'],
+                                       stdin=subprocess.PIPE,
+                                       stdout=subprocess.PIPE,
+                                       stderr=stderr_write,
+                                       preexec_fn=restore_signals)
+        except Exception:
+            os.close(stderr_read)
+            raise
+        finally:
+            os.close(stderr_write)
+
+        def write(text):
+            process.stdin.write(text)
+            process.stdin.flush()
+
+        return ShCoprocess(LocalShProcess([process], stderr_read), write)
+
+    def coprocess_command(self, command):
+        """Return ``command`` run in current working directory."""
+        return 'cd {cwd} && {command}'.format(
+            cwd=pipes.quote(os.getcwd()),
+            command=command)
+
+    def run_command_instance(self, command):
+        """Run Command instance."""
+        if self.use_coprocess(command):
+            return self.coprocess.run(self.coprocess_command(command))
+        return self.stream_command_instance(command).wait()
+
+    def cache_key(self, command):
+        """Return ``command``, shell mode, working directory and
+        environment."""
+        return (str(command), command.shell, os.getcwd(),
+                frozenset(os.environ.items()))
 
     def run(self, command):
         """Execute Cmd resource."""
         command = self.make_command_instance(command)
+        if self.use_cache(command):
+            return self.run_cached(command)
         return self.run_command_instance(command)
 
     def supports(self, session):
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""Policies to store output of commands.
+
+Assign instances to ``stdout`` or ``stderr`` of
+:class:`~xal.sh.resource.ShCommand`. They act as templates: every run of the
+command writes to a :meth:`new` instance.
+
+"""
+import collections
+import io
+import mmap
+import tempfile
+
+
+class MemoryOutput(object):
+    """Keep whole output in memory. Default policy."""
+    def __init__(self):
+        #: Chunks of data.
+        self.chunks = []
+        #: Number of bytes written.
+        self.size = 0
+
+    def new(self):
+        """Return empty output with same policy."""
+        return self.__class__()
+
+    def write(self, data):
+        """Append ``data``, text or :class:`memoryview`.
+
+        Memory views are not copied until output is read.
+
+        """
+        self.chunks.append(data)
+        self.size += len(data)
+
+    def getvalue(self):
+        """Return output as text."""
+        value = ''.join([chunk.tobytes() if isinstance(chunk, memoryview)
+                         else chunk
+                         for chunk in self.chunks])
+        self.chunks = [value]
+        return value
+
+    def open(self):
+        """Return file object to read output."""
+        return io.BytesIO(self.getvalue())
+
+    def buffer(self):
+        """Return read-only buffer of output. No copy if written at once."""
+        if len(self.chunks) == 1:
+            return memoryview(self.chunks[0])
+        return memoryview(self.getvalue())
+
+    def close(self):
+        """Release resources."""
+        self.chunks = []
+
+
+class SpooledOutput(object):
+    """Keep output in memory up to ``max_size`` bytes, then in a file.
+
+    The temporary file is created in ``dir`` (defaults to system's temporary
+    directory) and deleted when output is closed or garbage collected.
+
+    """
+    def __init__(self, max_size=1024 * 1024, dir=None):
+        #: Maximum number of bytes kept in memory.
+        self.max_size = max_size
+        #: Directory of temporary file.
+        self.dir = dir
+        #: Output kept in memory, until spilled.
+        self.memory = MemoryOutput()
+        #: Temporary file, once output exceeded :attr:`max_size`.
+        self.file = None
+        #: Number of bytes written.
+        self.size = 0
+
+    def new(self):
+        """Return empty output with same policy."""
+        return self.__class__(max_size=self.max_size, dir=self.dir)
+
+    @property
+    def spilled(self):
+        """Whether output has been written to a file."""
+        return self.file is not None
+
+    def write(self, data):
+        self.size += len(data)
+        if self.file is None:
+            if self.size <= self.max_size:
+                self.memory.write(data)
+                return
+            self.file = tempfile.TemporaryFile(dir=self.dir)
+            self.file.write(self.memory.getvalue())
+            self.memory = None
+        self.file.write(data)
+
+    def getvalue(self):
+        """Return output as text. Reads the whole file if spilled."""
+        return self.open().read()
+
+    def open(self):
+        """Return file object to read output, from the beginning.
+
+        If spilled, it is the temporary file itself: do not close it while
+        output is used.
+
+        """
+        if self.file is None:
+            return self.memory.open()
+        self.file.flush()
+        self.file.seek(0)
+        return self.file
+
+    def buffer(self):
+        """Return read-only buffer of output, memory-mapped if spilled."""
+        if self.file is None:
+            return self.memory.buffer()
+        self.file.flush()
+        return mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """Release resources, deleting the temporary file."""
+        if self.file is not None:
+            self.file.close()
+        self.memory = MemoryOutput()
+        self.file = None
+
+
+class TailOutput(object):
+    """Keep only the last ``max_size`` bytes of output."""
+    def __init__(self, max_size=64 * 1024):
+        #: Maximum number of bytes kept.
+        self.max_size = max_size
+        #: Chunks of data, the first one may be partially outdated.
+        self.chunks = collections.deque()
+        #: Number of bytes in :attr:`chunks`.
+        self.kept = 0
+        #: Number of bytes written.
+        self.size = 0
+
+    def new(self):
+        """Return empty output with same policy."""
+        return self.__class__(max_size=self.max_size)
+
+    def write(self, data):
+        self.chunks.append(data)
+        self.kept += len(data)
+        self.size += len(data)
+        while self.kept - len(self.chunks[0]) >= self.max_size:
+            self.kept -= len(self.chunks.popleft())
+
+    def getvalue(self):
+        """Return last bytes of output as text."""
+        value = ''.join(self.chunks)
+        if len(value) > self.max_size:
+            value = value[-self.max_size:]
+        return value
+
+    def open(self):
+        """Return file object to read last bytes of output."""
+        return io.BytesIO(self.getvalue())
+
+    def close(self):
+        """Release resources."""
+        self.chunks.clear()
+        self.kept = 0
+
+
+class DiscardOutput(object):
+    """Discard output. Only its size is recorded."""
+    def __init__(self):
+        #: Number of bytes written.
+        self.size = 0
+
+    def new(self):
+        """Return empty output with same policy."""
+        return self.__class__()
+
+    def write(self, data):
+        self.size += len(data)
+
+    def getvalue(self):
+        """Return empty text."""
+        return ''
+
+    def open(self):
+        """Return file object to read (empty) output."""
+        return io.BytesIO()
+
+    def close(self):
+        """Nothing to release."""
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 """Base stuff for providers that handle commands."""
-from xal.sh.resource import ShCommand
+import select
+import time
+
+from xal.sh.resource import ShCommand, ShResult
 from xal.provider import ResourceProvider
 
 
@@ -10,8 +13,310 @@ class CommandNotFound(Exception):
 
 class ShProvider(ResourceProvider):
     """Base class for command provider."""
+    #: Default number of commands :meth:`run_many` runs concurrently.
+    max_workers = 4
+
+    #: Whether :meth:`run` uses a long-lived shell (see :attr:`coprocess`)
+    #: instead of starting a shell per command.
+    persistent = False
+
+    #: Default timeout of commands, in seconds. ``None`` means no limit.
+    #: Commands' own ``timeout`` takes precedence.
+    timeout = None
+
+    #: :class:`~xal.sh.cache.ShResultCache` where results of cacheable
+    #: commands are kept. ``None`` (default) disables caching.
+    cache = None
+
     def __init__(self, resource_factory=ShCommand):
         super(ShProvider, self).__init__(resource_factory=resource_factory)
+        #: Long-lived shell, if started.
+        self._coprocess = None
 
     def run(self, command, *args):
         raise NotImplementedError()
+
+    @property
+    def coprocess(self):
+        """Long-lived :class:`~xal.sh.coprocess.ShCoprocess`.
+
+        Started on first access, restarted if it exited.
+
+        """
+        if self._coprocess is None or self._coprocess.closed:
+            self._coprocess = self.start_coprocess()
+        return self._coprocess
+
+    def start_coprocess(self):
+        """Start and return a :class:`~xal.sh.coprocess.ShCoprocess`."""
+        raise NotImplementedError()
+
+    def coprocess_command(self, command):
+        """Return text of ``command`` to run in :attr:`coprocess`.
+
+        Shell state is not inherited from session: such text has to set
+        working directory.
+
+        """
+        raise NotImplementedError()
+
+    def use_coprocess(self, command):
+        """Return whether :meth:`run` should run ``command`` in coprocess.
+
+        Commands reading stdin need a process of their own. So do commands
+        with output policies, since coprocess keeps output in memory, and
+        commands with a timeout, since killing them would kill coprocess.
+
+        """
+        return self.persistent \
+            and command.stdin is None \
+            and command.stdout is None \
+            and command.stderr is None \
+            and self.command_timeout(command) is None
+
+    def use_cache(self, command):
+        """Return whether :meth:`run` may reuse result of ``command``.
+
+        Only commands marked ``cacheable``, without input nor output
+        policies, are.
+
+        """
+        return self.cache is not None \
+            and command.cacheable \
+            and command.stdin is None \
+            and command.stdout is None \
+            and command.stderr is None
+
+    def cache_key(self, command):
+        """Return key of ``command`` in :attr:`cache`.
+
+        Key identifies command and its context: host, working directory and
+        environment.
+
+        """
+        raise NotImplementedError()
+
+    def run_cached(self, command):
+        """Return result of ``command`` from :attr:`cache`, or run it.
+
+        Only successful results are stored.
+
+        """
+        key = self.cache_key(command)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.run_command_instance(command)
+            if result.succeeded and not result.timed_out:
+                self.cache.set(key, result)
+        return result
+
+    def command_timeout(self, command):
+        """Return timeout of ``command``, defaults to :attr:`timeout`."""
+        if command.timeout is not None:
+            return command.timeout
+        return self.timeout
+
+    def command_deadline(self, command, deadline=None):
+        """Return time after which ``command`` has to be killed, if any: the
+        earliest of its timeout and ``deadline``."""
+        timeout = self.command_timeout(command)
+        if timeout is not None:
+            timeout_deadline = time.time() + timeout
+            if deadline is None or timeout_deadline < deadline:
+                deadline = timeout_deadline
+        return deadline
+
+    def run_batch(self, commands, stop_on_error=False):
+        """Run ``commands`` one after the other, return list of results.
+
+        If ``stop_on_error`` is true, commands following the first one which
+        fails do not run: their results have an ``error``.
+
+        Default implementation runs commands one by one. Remote providers
+        run them in a single script, i.e. in one round trip: commands
+        having ``stdin``, output policies or a ``timeout`` of their own
+        cannot be batched there, they raise :class:`ValueError`.
+
+        """
+        results = []
+        failed = False
+        for command in commands:
+            if failed:
+                result = ShResult()
+                result.error = ValueError(
+                    'Command was not run: a previous command failed.')
+            else:
+                result = self.run(command)
+                failed = stop_on_error and not result.succeeded
+            results.append(result)
+        return results
+
+    def stream(self, command, deadline=None):
+        """Start command and return :class:`~xal.sh.resource.ShResult` whose
+        output can be consumed while it is produced.
+
+        Does not wait for the command to terminate: use the result's
+        ``wait()`` method, or :meth:`wait` to run several commands
+        concurrently.
+
+        ``deadline`` (as returned by :func:`time.time`), if any, shortens
+        command's timeout. As with timeouts, the command is started so that
+        it can be killed with its children.
+
+        """
+        command = self.make_command_instance(command)
+        return self.stream_command_instance(command, deadline=deadline)
+
+    def stream_command_instance(self, command, deadline=None):
+        """Start Command instance, return result attached to the process.
+
+        Default implementation runs the command until it terminates: the
+        output is then available as a single chunk.
+
+        """
+        return self.run_command_instance(command)
+
+    def as_completed(self, results, max_workers=None, timeout=None):
+        """Yield ``results`` (as returned by :meth:`stream`) as they complete.
+
+        Output of all running commands is collected (and input is fed) in
+        the calling thread, polling the processes' file descriptors.
+
+        ``results`` is consumed lazily: when ``max_workers`` is set, next
+        result is pulled only when less than ``max_workers`` commands are
+        running. So pass a generator to bound concurrency.
+
+        Exceptions raised while collecting output are stored as
+        ``result.error``: they do not interrupt other commands.
+
+        ``timeout`` is an overall delay, in seconds, shared by all
+        ``results``: commands still running when it is over are killed and
+        marked ``timed_out``. Since ``results`` are already started, only
+        commands started with a timeout (or a ``deadline``) are killed with
+        their children: others' children may survive. :meth:`run_many`
+        starts commands with the deadline of the batch.
+
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+        results = iter(results)
+        poller = select.poll()
+        pending = {}  # File descriptor => result.
+        running = set()
+        exhausted = False
+        while True:
+            while not exhausted and (max_workers is None
+                                     or len(running) < max_workers):
+                try:
+                    result = next(results)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if result.done:
+                    yield result
+                    continue
+                if timeout is not None:
+                    result.set_deadline(deadline)
+                running.add(result)
+                for fd in result.process.filenos():
+                    poller.register(fd, select.POLLIN | select.POLLOUT)
+                    pending[fd] = result
+            if not running:
+                break
+            events = poller.poll(self._poll_timeout(running))
+            # Results whose file descriptors are ready, or whose deadline is
+            # over.
+            ready = [pending[fd] for fd, event in events if fd in pending]
+            ready.extend([overdue for overdue in running
+                          if overdue.deadline is not None
+                          and overdue.deadline <= time.time()])
+            for result in ready:
+                if result not in running:  # Already completed.
+                    continue
+                try:
+                    done = result.poll()
+                except Exception as exception:
+                    result.error = exception
+                    result.process = None
+                    done = True
+                # Forget file descriptors that reached end of file.
+                open_fds = [] if done else result.process.filenos()
+                for other_fd, other in list(pending.items()):
+                    if other is result and other_fd not in open_fds:
+                        poller.unregister(other_fd)
+                        del pending[other_fd]
+                if done:
+                    running.discard(result)
+                    yield result
+
+    def _poll_timeout(self, results):
+        """Return milliseconds until nearest deadline of ``results``."""
+        deadlines = [result.deadline for result in results
+                     if result.deadline is not None]
+        if not deadlines:
+            return None
+        return max(0, int((min(deadlines) - time.time()) * 1000) + 1)
+
+    def wait(self, results, timeout=None):
+        """Wait for all ``results`` to complete and return them as a list.
+
+        See :meth:`as_completed` about ``timeout``.
+
+        """
+        results = list(results)
+        for result in self.as_completed(results, timeout=timeout):
+            pass
+        return results
+
+    def run_many(self, commands, max_workers=None, ordered=True,
+                 timeout=None):
+        """Run ``commands`` concurrently, yield :class:`ShResult` instances.
+
+        At most ``max_workers`` commands run at once (defaults to
+        :attr:`max_workers`). If ``ordered`` is true, results are yielded in
+        the order of ``commands``, else as soon as they complete.
+
+        Errors are captured per command, as ``result.error``, instead of
+        aborting the batch.
+
+        ``timeout`` is an overall delay, in seconds, for the whole batch:
+        running commands are killed when it is over, with their children,
+        and remaining ones are not started. Their results are marked
+        ``timed_out``.
+
+        """
+        if max_workers is None:
+            max_workers = self.max_workers
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        indexes = {}  # Result id => index in commands.
+
+        def start():
+            for index, command in enumerate(commands):
+                if timeout is not None and time.time() >= deadline:
+                    result = ShResult()
+                    result.timed_out = True
+                    indexes[id(result)] = index
+                    yield result
+                    continue
+                try:
+                    result = self.stream(command, deadline=deadline)
+                except Exception as exception:
+                    result = ShResult()
+                    result.error = exception
+                indexes[id(result)] = index
+                yield result
+
+        completed = self.as_completed(start(), max_workers=max_workers)
+        if not ordered:
+            for result in completed:
+                yield result
+            return
+        ready = {}  # Index => result.
+        next_index = 0
+        for result in completed:
+            ready[indexes.pop(id(result))] = result
+            while next_index in ready:
+                yield ready.pop(next_index)
+                next_index += 1
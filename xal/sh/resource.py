@@ -1,21 +1,36 @@
 """Command resource."""
+import pipes
+import time
+
 from xal.resource import Resource
+from xal.sh.output import MemoryOutput
 
 
 class ShCommand(Resource):
     def __init__(self, arguments=[], stdin=None, stdout=None, stderr=None,
-                 *args, **kwargs):
+                 shell=True, timeout=None, cacheable=False, *args,
+                 **kwargs):
         super(ShCommand, self).__init__(*args, **kwargs)
         if isinstance(arguments, basestring):
             arguments = [arguments]
         #: Actual command and arguments, iterable.
         self.arguments = arguments
-        #: Input.
+        #: Input: text, file, path, or iterable of chunks. See
+        #: :mod:`xal.sh.input`.
         self.stdin = stdin
-        #: Output.
+        #: Output policy, see :mod:`xal.sh.output`. Defaults to memory.
         self.stdout = stdout
-        #: Errors.
+        #: Errors policy, see :mod:`xal.sh.output`. Defaults to memory.
         self.stderr = stderr
+        #: Whether command is interpreted by sh. If ``False``, arguments are
+        #: executed as is (argv), without shell and without quoting issues.
+        self.shell = shell
+        #: Seconds after which the command is killed. ``None`` means session's
+        #: default (``session.sh.timeout``), which defaults to no limit.
+        self.timeout = timeout
+        #: Whether result can be reused, i.e. command is idempotent and does
+        #: not alter anything. See :mod:`xal.sh.cache`.
+        self.cacheable = cacheable
 
     def __call__(self, session=None):
         """Run the command in ``session`` (defaults to :py:attr:`session`)."""
@@ -23,11 +38,23 @@ class ShCommand(Resource):
             self.xal_session = session
         return self.xal_session.sh.run(self)
 
+    def stream(self, session=None):
+        """Start the command in ``session`` and return streaming result.
+
+        See :meth:`ShResult.iter_chunks` and :meth:`ShResult.iter_lines`.
+
+        """
+        if session is not None:
+            self.xal_session = session
+        return self.xal_session.sh.stream(self)
+
     def __repr__(self):
         return '{cls}({command})'.format(cls=self.__class__.__name__,
                                          command=str(self))
 
     def __str__(self):
+        if not self.shell:
+            return ' '.join([pipes.quote(str(arg)) for arg in self.arguments])
         return ' '.join([str(arg) for arg in self.arguments])
 
     @property
@@ -44,20 +71,270 @@ class ShCommand(Resource):
 
 
 class ShResult(object):
-    def __init__(self):
-        #: Output.
-        self.stdout = None
-        #: Errors.
-        self.stderr = None
+    """Result of a command.
+
+    Results returned by ``run()`` are complete: the command terminated and
+    its output has been collected.
+
+    Results returned by ``stream()`` are attached to the running
+    :attr:`process`, whose output is consumed as it is produced. A process
+    is any object with:
+
+    * ``read(timeout=None)`` returning a list of ``(name, data)`` chunks,
+      where ``name`` is either ``'stdout'`` or ``'stderr'``;
+    * ``filenos()`` returning file descriptors that become readable when
+      output is available, or writable when input can be fed;
+    * ``closed`` boolean, true once all output has been read;
+    * ``wait()`` returning the list of return codes, one per stage of the
+      pipeline (a single one for simple commands);
+    * ``kill()`` killing all processes of the command, including their
+      children when possible.
+
+    """
+    #: Seconds to wait for remaining output of killed commands. Processes
+    #: which escaped the kill (daemons...) may keep output open: they are
+    #: abandoned after this delay.
+    kill_timeout = 1
+
+    def __init__(self, process=None, stdout=None, stderr=None, deadline=None):
         #: Return code. ``O`` (zero) means success.
         self.return_code = None
+        #: Return codes of every stage of pipelines, when known.
+        #: :attr:`return_code` is the one of the last stage.
+        self.return_codes = None
+        #: Exception raised while running the command, if any.
+        self.error = None
+        #: Running process which feeds the result, if any.
+        self.process = process
+        #: Mapping of stream names to outputs, such as
+        #: :class:`~xal.sh.output.MemoryOutput` instances. ``stdout`` and
+        #: ``stderr`` are policies (see :mod:`xal.sh.output`) for results
+        #: of running processes. ``None`` means "not set".
+        self.outputs = {'stdout': None, 'stderr': None}
+        if process is not None:
+            self.outputs['stdout'] = (stdout or MemoryOutput()).new()
+            self.outputs['stderr'] = (stderr or MemoryOutput()).new()
+        #: Time (as returned by :func:`time.time`) after which the command is
+        #: killed, if any.
+        self.deadline = deadline
+        #: Whether the command was killed because it exceeded
+        #: :attr:`deadline`. Output collected so far is kept.
+        self.timed_out = False
+        #: Names of the streams consumed via :meth:`iter_chunks`.
+        self._streamed = set()
+
+    def _get_output(self, name):
+        output = self.outputs[name]
+        if output is None or not self.done or name in self._streamed:
+            return None
+        return output.getvalue()
+
+    def _set_output(self, name, value):
+        output = None
+        if value is not None:
+            output = MemoryOutput()
+            output.write(value)
+        self.outputs[name] = output
+
+    @property
+    def stdout(self):
+        """Output, as text. ``None`` until command terminated, or if
+        streamed."""
+        return self._get_output('stdout')
+
+    @stdout.setter
+    def stdout(self, value):
+        self._set_output('stdout', value)
+
+    @property
+    def stderr(self):
+        """Errors, as text. ``None`` until command terminated, or if
+        streamed."""
+        return self._get_output('stderr')
+
+    @stderr.setter
+    def stderr(self, value):
+        self._set_output('stderr', value)
+
+    def decode(self, encoding='utf-8', errors='strict', name='stdout'):
+        """Return ``name`` output decoded as unicode, as ``bytes.decode()``
+        would.
+
+        Output is kept as bytes: it is decoded on demand only.
+
+        """
+        value = self._get_output(name)
+        if value is None:
+            return None
+        return value.decode(encoding, errors)
+
+    def open(self, name='stdout'):
+        """Return file object to read ``name`` output.
+
+        Useful with outputs stored in files, see
+        :class:`~xal.sh.output.SpooledOutput`.
+
+        """
+        return self.outputs[name].open()
 
     @property
     def succeeded(self):
         """Boolean indicating whether last execution succeeded."""
         return self.return_code is 0
 
+    def iter_chunks(self, name='stdout'):
+        """Yield chunks of ``name`` output as they are produced.
+
+        Streamed output is not stored: the matching attribute
+        (:attr:`stdout` or :attr:`stderr`) remains ``None``. The other stream
+        is collected as usual. :attr:`return_code` is set once iteration is
+        over.
+
+        """
+        if self.process is None:  # Already complete, replay output.
+            value = getattr(self, name)
+            if value:
+                yield value
+            return
+        self._streamed.add(name)
+        output = self.outputs[name]
+        if output.size:  # Collected before streaming started.
+            yield output.getvalue()
+            output.close()
+        while not self.process.closed:
+            chunks = self._read(None)
+            for stream, data in chunks:
+                if stream == name:
+                    yield data
+                elif stream not in self._streamed:
+                    self.outputs[stream].write(data)
+            if self.timed_out and not chunks:
+                break
+        self._finish()
+
+    def iter_lines(self, name='stdout'):
+        """Yield lines of ``name`` output as they are produced.
+
+        Lines keep their trailing newline, as file objects do.
+
+        """
+        for line, terminated in self._split(name, '\n'):
+            yield line + '\n' if terminated else line
+
+    def iter_records(self, name='stdout', separator='\0'):
+        """Yield records of ``name`` output, as they are produced.
+
+        Records are separated by ``separator``, a single character, which is
+        not part of them. NUL-separated records can hold any file name.
+
+        """
+        for record, terminated in self._split(name, separator):
+            yield record
+
+    def _split(self, name, separator):
+        """Yield ``(record, terminated)`` of ``name`` output split on
+        ``separator`` character. Only the last record may not be terminated.
+
+        Chunks of incomplete records are kept in a list, and only new chunks
+        are searched: output without separators is not copied over and over.
+
+        """
+        pending = []  # Chunks of incomplete record.
+        for chunk in self.iter_chunks(name):
+            start = 0
+            end = chunk.find(separator)
+            while end != -1:
+                pending.append(chunk[start:end])
+                yield ''.join(pending), True
+                pending = []
+                start = end + 1
+                end = chunk.find(separator, start)
+            if start < len(chunk):
+                pending.append(chunk[start:])
+        if pending:
+            yield ''.join(pending), False
+
+    @property
+    def done(self):
+        """Whether the command terminated and its output was collected."""
+        return self.process is None
+
+    def poll(self, timeout=0):
+        """Collect output available within ``timeout``, return :attr:`done`.
+
+        ``timeout`` is in seconds. ``None`` means block until some output is
+        available.
+
+        """
+        if self.process is not None:
+            chunks = self._read(timeout)
+            for stream, data in chunks:
+                if stream not in self._streamed:
+                    self.outputs[stream].write(data)
+            if self.process.closed or (self.timed_out and not chunks):
+                self._finish()
+        return self.done
+
+    def set_deadline(self, deadline):
+        """Make sure the command is killed at ``deadline`` at the latest."""
+        if self.deadline is None or deadline < self.deadline:
+            self.deadline = deadline
+
+    def kill(self):
+        """Kill the running command, keep output collected so far.
+
+        Local commands with a timeout are killed with their process group.
+        Remote ones with their process group on the remote host.
+
+        """
+        if self.process is not None:
+            self.process.kill()
+
+    def _read(self, timeout):
+        """Return chunks of output available within ``timeout``.
+
+        Kills the command if :attr:`deadline` is over.
+
+        """
+        if self.deadline is not None and not self.timed_out:
+            left = self.deadline - time.time()
+            if left <= 0:
+                self.timed_out = True
+                self.kill()
+            elif timeout is None or timeout > left:
+                timeout = left
+        if self.timed_out:
+            timeout = self.kill_timeout
+        return self.process.read(timeout)
+
+    def wait(self):
+        """Wait for the process to terminate, collect output, return self."""
+        while not self.poll(timeout=None):
+            pass
+        return self
+
+    def _finish(self):
+        """Collect return code, detach process."""
+        if self.process is None:
+            return
+        return_codes = self.process.wait()
+        self.return_code = return_codes[-1]
+        if None not in return_codes:
+            self.return_codes = return_codes
+        self.process = None
+
 
 class ShPipe(ShCommand):
     def __str__(self):
         return ' | '.join([str(arg) for arg in self.arguments])
+
+    @property
+    def stages(self):
+        """Flat list of piped commands."""
+        stages = []
+        for command in self.arguments:
+            if isinstance(command, ShPipe):
+                stages.extend(command.stages)
+            else:
+                stages.append(command)
+        return stages